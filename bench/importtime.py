@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""Cold start import time check for the trello-cli entry point"""
+
+import os
+import re
+import sys
+import getopt
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIB  = os.path.join(os.path.dirname(HERE), "lib")
+
+ENTRY_POINT = "de.tobijk.trello.cli"
+
+# modules which must only be loaded once a command actually needs them
+DEFERRED = [
+    "requests",
+    "dateutil",
+    "sqlite3",
+    "asyncio",
+    "concurrent.futures",
+    "hashlib",
+    "csv"
+]
+
+DEFAULT_BUDGET_MS = 25.0
+DEFAULT_RUNS      = 15
+
+def usage():
+    sys.stdout.write(
+        "Usage: importtime.py [OPTIONS]                                    \n"
+        "                                                                  \n"
+        "Imports the trello-cli entry point in fresh interpreters with     \n"
+        "-X importtime and fails if the median cumulative import time      \n"
+        "exceeds the budget or if a deferred module is loaded eagerly.     \n"
+        "                                                                  \n"
+        "OPTIONS:                                                          \n"
+        "                                                                  \n"
+        " --budget <ms>     The time budget in milliseconds (%.0f).          \n"
+        " --runs <n>        How many interpreters to start (%d).            \n"
+        "                                                                  \n"
+        % (DEFAULT_BUDGET_MS, DEFAULT_RUNS)
+    )
+#end function
+
+def measure():
+    env = dict(os.environ, PYTHONPATH=LIB)
+
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c",
+        "import " + ENTRY_POINT], env=env, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, universal_newlines=True,
+            check=True).stderr
+
+    total   = None
+    modules = set()
+
+    for line in output.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)$", line)
+        if not m:
+            continue
+
+        modules.add(m.group(2))
+
+        if m.group(2) == ENTRY_POINT:
+            total = int(m.group(1)) / 1000.0
+    #end for
+
+    return total, modules
+#end function
+
+def main():
+    budget = DEFAULT_BUDGET_MS
+    runs   = DEFAULT_RUNS
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h",
+                ["help", "budget=", "runs="])
+        for o, v in opts:
+            if o in ["-h", "--help"]:
+                usage()
+                return 0
+            elif o == "--budget":
+                budget = float(v)
+            elif o == "--runs":
+                runs = max(1, int(v))
+        #end for
+    except (getopt.GetoptError, ValueError):
+        usage()
+        return 1
+    #end try
+
+    # the first run may have to write bytecode caches
+    measure()
+
+    timings = []
+    loaded  = set()
+
+    for i in range(runs):
+        total, modules = measure()
+        timings.append(total)
+        loaded |= set(name for name in DEFERRED if name in modules)
+    #end for
+
+    median = statistics.median(timings)
+
+    print("cold start import of %s: median %.1f ms, min %.1f ms, max %.1f ms "
+        "(budget %.1f ms)" % (ENTRY_POINT, median, min(timings),
+            max(timings), budget))
+
+    failed = False
+
+    if loaded:
+        print("FAIL: imported eagerly: %s" % ", ".join(sorted(loaded)))
+        failed = True
+    if median > budget:
+        print("FAIL: import time exceeds the budget")
+        failed = True
+
+    return 1 if failed else 0
+#end function
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+
+"""Local HTTP server emulating the parts of the Trello API trello-cli uses"""
+
+import sys
+import json
+import time
+import random
+import getopt
+import threading
+
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl, unquote
+
+LABEL_COLORS = ["green", "yellow", "orange", "red", "purple", "blue"]
+
+class MockTrello:
+
+    def __init__(self, boards=1, lists=5, cards=100, labels=6, comments=0,
+            latency=0.0, error_rate=0.0, error_status=500, seed=0):
+        self.latency      = latency
+        self.error_rate   = error_rate
+        self.error_status = error_status
+
+        self._random  = random.Random(seed)
+        self._lock    = threading.RLock()
+        self._next_id = 0
+        self._server  = None
+
+        self.boards  = {}
+        self.lists   = {}
+        self.cards   = {}
+        self.labels  = {}
+        self.actions = []
+
+        # rendered GET responses, dropped on every write
+        self._rendered = {}
+
+        self.reset_stats()
+        self.populate(boards, lists, cards, labels, comments)
+    #end function
+
+    # DATA
+
+    def populate(self, boards, lists, cards, labels, comments=0):
+        # Creates `boards` boards with `lists` lists of `cards` cards each.
+        # Every card carries a random subset of the board's labels.
+        self._rendered = {}
+
+        for b in range(boards):
+            board = self._board("Board %d" % (b + 1))
+            self._action("createBoard", board["id"], {"board": dict(board)})
+
+            board_labels = [self._label(board["id"], "Label %d" % (i + 1),
+                LABEL_COLORS[i % len(LABEL_COLORS)]) for i in range(labels)]
+
+            for l in range(lists):
+                list_ = self._list(board["id"], "List %d" % (l + 1),
+                        (l + 1) * 16384.0)
+
+                for c in range(cards):
+                    id_labels = [label["id"] for label in board_labels
+                            if self._random.random() < 0.2]
+                    card = self._card(list_, "Card %d.%d" % (l + 1, c + 1),
+                            (c + 1) * 16384.0, id_labels=id_labels,
+                            desc="Description of card %d in list %d" %
+                                (c + 1, l + 1))
+
+                    for i in range(comments):
+                        self._action("commentCard", board["id"],
+                                {"card": {"id": card["id"]},
+                                    "text": "Comment %d" % (i + 1)})
+                    #end for
+                #end for
+            #end for
+        #end for
+    #end function
+
+    def _new_id(self):
+        with self._lock:
+            self._next_id += 1
+            # like Trello's, ids start with their creation time
+            return "%08x%016x" % (int(time.time()), self._next_id)
+    #end function
+
+    def _board(self, name):
+        board = {"id": self._new_id(), "name": name, "desc": "",
+                "closed": False}
+        self.boards[board["id"]] = board
+        return board
+    #end function
+
+    def _list(self, board_id, name, pos):
+        list_ = {"id": self._new_id(), "name": name, "idBoard": board_id,
+                "pos": pos, "closed": False}
+        self.lists[list_["id"]] = list_
+        return list_
+    #end function
+
+    def _card(self, list_, name, pos, id_labels=None, desc="", due=None):
+        card = {"id": self._new_id(), "name": name, "desc": desc,
+                "idList": list_["id"], "idBoard": list_["idBoard"],
+                "pos": pos, "due": due, "closed": False,
+                "idLabels": id_labels or []}
+        self.cards[card["id"]] = card
+        return card
+    #end function
+
+    def _label(self, board_id, name, color):
+        label = {"id": self._new_id(), "name": name, "color": color,
+                "idBoard": board_id}
+        self.labels[label["id"]] = label
+        return label
+    #end function
+
+    def _action(self, type_, board_id, data):
+        action = {"id": self._new_id(), "type": type_, "idBoard": board_id,
+                "date": datetime.now(timezone.utc).isoformat(), "data": data}
+        self.actions.append(action)
+        return action
+    #end function
+
+    # STATS
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "errors": 0, "request_bytes": 0,
+                    "response_bytes": 0, "endpoints": {}}
+        #end with
+    #end function
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def _count(self, verb, path, received, sent, error):
+        # ids are replaced, so that requests are grouped by endpoint
+        parts = [part for part in path.split("/") if part]
+        if parts[:1] == ["1"]:
+            parts = parts[1:]
+
+        endpoint = verb + " /" + "/".join(["{id}" if len(part) == 24 else part
+            for part in parts])
+
+        with self._lock:
+            self._stats["requests"]       += 1
+            self._stats["errors"]         += 1 if error else 0
+            self._stats["request_bytes"]  += received
+            self._stats["response_bytes"] += sent
+
+            endpoints = self._stats["endpoints"]
+            endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+        #end with
+    #end function
+
+    # SERVER
+
+    def start(self, port=0):
+        # Serves in a background thread and returns the base URL to
+        # configure the client with.
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+
+        thread = threading.Thread(target=self._server.serve_forever,
+                kwargs={"poll_interval": 0.01})
+        thread.daemon = True
+        thread.start()
+
+        return "http://127.0.0.1:%d/1/" % self._server.server_port
+    #end function
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        #end if
+    #end function
+
+    def inject_error(self):
+        with self._lock:
+            return self.error_rate > 0 and \
+                    self._random.random() < self.error_rate
+    #end function
+
+    # ROUTES
+
+    def respond(self, verb, path, params):
+        # Returns a tuple (status, content) with the encoded body. Repeated
+        # GETs are served from the rendered bytes until the next write, so
+        # that a warmed up mock allocates next to nothing and stays out of
+        # the client's memory measurements.
+        key = (path, tuple(sorted(params.items())))
+
+        with self._lock:
+            if verb != "GET":
+                self._rendered = {}
+            elif key in self._rendered:
+                return 200, self._rendered[key]
+
+            status, data = self.handle(verb, path, params)
+
+            if status != 200:
+                return status, data.encode("utf-8")
+
+            content = json.dumps(data).encode("utf-8")
+
+            if verb == "GET":
+                self._rendered[key] = content
+
+            return status, content
+        #end with
+    #end function
+
+    def handle(self, verb, path, params):
+        # Returns a tuple (status, body) for the request.
+        parts = [p for p in path.split("/") if p]
+
+        if parts[:1] == ["1"]:
+            parts = parts[1:]
+
+        try:
+            with self._lock:
+                return self._route(verb, parts, params)
+        except KeyError as e:
+            return 404, "The requested resource was not found."
+        except ValueError as e:
+            return 400, "invalid value: %s" % str(e)
+        #end try
+    #end function
+
+    def _route(self, verb, parts, params):
+        resource = parts[0] if parts else ""
+        obj_id   = parts[1] if len(parts) > 1 else None
+        sub      = "/".join(parts[2:])
+
+        if verb == "GET":
+            if parts == ["batch"]:
+                return 200, self._batch(params)
+            if parts == ["members", "me", "boards"]:
+                return 200, self._select(self.boards.values(), params)
+            if resource == "boards" and not sub:
+                return 200, self._get_board(self.boards[obj_id], params)
+            if resource == "boards":
+                # unknown boards are a 404 for all of their resources
+                self.boards[obj_id]
+            if resource == "boards" and sub == "lists":
+                return 200, self._select([l for l in self.lists.values()
+                    if l["idBoard"] == obj_id], params)
+            if resource == "boards" and sub == "cards":
+                return 200, self._select([c for c in self.cards.values()
+                    if c["idBoard"] == obj_id], params, self._full_card)
+            if resource == "boards" and sub == "labels":
+                return 200, self._select([l for l in self.labels.values()
+                    if l["idBoard"] == obj_id], params, default="all")
+            if resource == "boards" and sub == "actions":
+                return 200, self._get_actions(obj_id, params)
+            if resource == "lists" and not sub:
+                return 200, self._project(self.lists[obj_id], params)
+            if resource == "lists" and sub == "cards":
+                self.lists[obj_id]
+                return 200, self._select([c for c in self.cards.values()
+                    if c["idList"] == obj_id], params, self._full_card)
+            if resource == "cards" and not sub:
+                return 200, self._project(self._full_card(self.cards[obj_id]),
+                        params)
+            if resource == "cards" and sub == "actions":
+                return 200, [a for a in self._get_actions(
+                    self.cards[obj_id]["idBoard"], dict(params, limit=1000))
+                        if a["data"].get("card", {}).get("id") == obj_id]
+            if resource == "labels" and not sub:
+                return 200, self._project(self.labels[obj_id], params)
+        elif verb == "POST":
+            if parts == ["cards"]:
+                return 200, self._create_card(params)
+            if resource == "cards" and sub == "actions/comments":
+                card = self.cards[obj_id]
+                return 200, self._action("commentCard", card["idBoard"],
+                        {"card": {"id": card["id"]},
+                            "text": params.get("text", "")})
+            if parts == ["labels"]:
+                label = self._label(params["idBoard"], params.get("name", ""),
+                        params.get("color"))
+                self._action("createLabel", label["idBoard"],
+                        {"label": dict(label)})
+                return 200, label
+        elif verb == "PUT":
+            if resource == "cards" and not sub:
+                return 200, self._update_card(self.cards[obj_id], params)
+        elif verb == "DELETE":
+            if resource == "cards" and not sub:
+                card = self.cards.pop(obj_id)
+                self._action("deleteCard", card["idBoard"],
+                        {"card": {"id": card["id"]}})
+                return 200, {"limits": {}}
+            #end if
+        #end if
+
+        return 404, "Cannot %s /1/%s" % (verb, "/".join(parts))
+    #end function
+
+    def _batch(self, params):
+        results = []
+
+        for url in params["urls"].split(","):
+            url = urlparse(unquote(url))
+            try:
+                status, body = self._route("GET",
+                        [p for p in url.path.split("/") if p],
+                        dict(parse_qsl(url.query)))
+            except KeyError:
+                status, body = 404, "The requested resource was not found."
+            #end try
+
+            if status == 200:
+                results.append({"200": body})
+            else:
+                results.append({"name": "Error", "message": body,
+                    "statusCode": status})
+        #end for
+
+        return results
+    #end function
+
+    def _get_board(self, board, params):
+        data = self._project(board, params)
+
+        for name, objects, convert in [
+                ("lists", self.lists, None),
+                ("cards", self.cards, self._full_card),
+                ("labels", self.labels, None)]:
+            if name in params and params[name] != "none":
+                data[name] = self._select([obj for obj in objects.values()
+                    if obj["idBoard"] == board["id"]],
+                        {"filter": params[name]}, convert)
+            #end if
+        #end for
+
+        return data
+    #end function
+
+    def _get_actions(self, board_id, params):
+        filters = params.get("filter", "all").split(",")
+        limit   = int(params.get("limit", 50))
+        since   = params.get("since")
+        before  = params.get("before")
+        actions = []
+
+        # newest first, like the real API
+        for action in reversed(self.actions):
+            if action["idBoard"] != board_id:
+                continue
+            if "all" not in filters and action["type"] not in filters:
+                continue
+            if since and action["id"] <= since:
+                break
+            if before and action["id"] >= before:
+                continue
+
+            actions.append(action)
+
+            if len(actions) >= limit:
+                break
+        #end for
+
+        return actions
+    #end function
+
+    def _create_card(self, params):
+        list_ = self.lists[params["idList"]]
+        card  = self._card(list_, params.get("name", ""),
+                self._position(list_["id"], params.get("pos", "bottom")),
+                id_labels=[l for l in params.get("idLabels", "").split(",")
+                    if l], desc=params.get("desc", ""), due=params.get("due"))
+
+        self._action("createCard", card["idBoard"], {"card": dict(card),
+            "list": {"id": list_["id"]}})
+
+        return self._full_card(card)
+    #end function
+
+    def _update_card(self, card, params):
+        changes = {}
+
+        for name, value in params.items():
+            if name in ["key", "token"]:
+                continue
+            if name == "pos":
+                value = self._position(card["idList"], value)
+            elif name == "closed":
+                value = value == "true"
+            elif name == "idLabels":
+                value = [l for l in value.split(",") if l]
+            elif name == "idList":
+                self.lists[value]
+            changes[name] = value
+        #end for
+
+        data = {"card": dict(changes, id=card["id"])}
+        if "idList" in changes:
+            data["listAfter"] = {"id": changes["idList"]}
+
+        card.update(changes)
+        self._action("updateCard", card["idBoard"], data)
+
+        return self._full_card(card)
+    #end function
+
+    def _position(self, list_id, pos):
+        positions = [c["pos"] for c in self.cards.values()
+                if c["idList"] == list_id]
+
+        if pos == "top":
+            return min(positions + [32768.0]) / 2.0
+        if pos == "bottom":
+            return max(positions + [0.0]) + 16384.0
+
+        return float(pos)
+    #end function
+
+    def _full_card(self, card):
+        data = dict(card)
+        data["labels"] = [self.labels[l] for l in card["idLabels"]
+                if l in self.labels]
+        return data
+    #end function
+
+    def _select(self, objects, params, convert=None, default="open"):
+        filter_ = params.get("filter", default)
+        result  = []
+
+        for obj in sorted(objects, key=lambda o: (o.get("pos", 0), o["id"])):
+            if filter_ == "open" and obj.get("closed"):
+                continue
+            if filter_ == "closed" and not obj.get("closed"):
+                continue
+            if convert:
+                obj = convert(obj)
+            result.append(self._project(obj, params))
+        #end for
+
+        return result
+    #end function
+
+    @staticmethod
+    def _project(obj, params):
+        fields = params.get("fields", "all")
+
+        if fields == "all":
+            return dict(obj)
+
+        names = set(fields.split(",")) | set(["id"])
+        return dict((k, v) for k, v in obj.items() if k in names)
+    #end function
+
+#end class
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    # headers and body go out in separate writes
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, verb):
+        mock   = self.server.mock
+        url    = urlparse(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get("Content-Length") or 0)
+        body   = self.rfile.read(length) if length else b""
+
+        if body:
+            params.update(parse_qsl(body.decode("utf-8"),
+                keep_blank_values=True))
+
+        if mock.latency:
+            time.sleep(mock.latency)
+
+        headers = {}
+
+        if mock.inject_error():
+            status = mock.error_status
+            data   = "injected error"
+            if status == 429:
+                headers["Retry-After"] = "0"
+            content = data.encode("utf-8")
+        else:
+            status, content = mock.respond(verb, url.path, params)
+        #end if
+
+        if status == 200:
+            headers["Content-Type"] = "application/json; charset=utf-8"
+        else:
+            headers["Content-Type"] = "text/plain; charset=utf-8"
+
+        # count first, the client may be done as soon as it has the response
+        mock._count(verb, url.path, len(self.path) + len(body), len(content),
+                status != 200)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+    #end function
+
+#end class
+
+def usage():
+    sys.stdout.write(
+        "Usage: mockserver.py [OPTIONS]                                    \n"
+        "                                                                  \n"
+        "Serves a generated Trello account on localhost until interrupted. \n"
+        "Point the \"url\" setting in ~/.trello-cli/config.json at it.       \n"
+        "                                                                  \n"
+        "OPTIONS:                                                          \n"
+        "                                                                  \n"
+        " --port <n>        The port to listen on (8080).                  \n"
+        " --boards <n>      Number of boards (1).                          \n"
+        " --lists <n>       Number of lists per board (5).                 \n"
+        " --cards <n>       Number of cards per list (100).                \n"
+        " --labels <n>      Number of labels per board (6).                \n"
+        " --comments <n>    Number of comments per card (0).               \n"
+        " --latency <ms>    Delay added to each response (0).              \n"
+        " --error-rate <f>  Fraction of requests that fail (0.0).          \n"
+        " --error-status <n> HTTP status of failed requests (500).         \n"
+        "                                                                  \n"
+    )
+#end function
+
+def main():
+    options = {}
+    port    = 8080
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h",
+                ["help", "port=", "boards=", "lists=", "cards=", "labels=",
+                    "comments=", "latency=", "error-rate=", "error-status="])
+        for o, v in opts:
+            if o in ["-h", "--help"]:
+                usage()
+                return 0
+            elif o == "--port":
+                port = int(v)
+            elif o == "--latency":
+                options["latency"] = float(v) / 1000.0
+            elif o == "--error-rate":
+                options["error_rate"] = float(v)
+            elif o == "--error-status":
+                options["error_status"] = int(v)
+            else:
+                options[o[2:]] = int(v)
+        #end for
+    except (getopt.GetoptError, ValueError):
+        usage()
+        return 1
+    #end try
+
+    mock = MockTrello(**options)
+    url  = mock.start(port)
+
+    print("serving %d boards, %d lists and %d cards on %s" %
+            (len(mock.boards), len(mock.lists), len(mock.cards), url))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+    return 0
+#end function
+
+if __name__ == "__main__":
+    sys.exit(main())
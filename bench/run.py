@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+
+"""Latency and request count benchmarks against a local mock Trello API"""
+
+import io
+import os
+import sys
+import json
+import time
+import getopt
+import shutil
+import fnmatch
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIB  = os.path.join(os.path.dirname(HERE), "lib")
+
+sys.path.insert(0, HERE)
+sys.path.insert(0, LIB)
+
+from mockserver import MockTrello
+
+from de.tobijk.trello.cli    import Cli
+from de.tobijk.trello.client import Client, tci
+from de.tobijk.trello.retry  import RetryPolicy
+from de.tobijk.trello.board  import Board
+from de.tobijk.trello.list   import List
+from de.tobijk.trello.card   import Card
+from de.tobijk.trello.mirror import Mirror, MirrorClient
+
+# board dimensions as (lists, cards per list, labels, comments per card)
+SIZES = {
+    "small":  (5, 20, 6, 0),
+    "medium": (10, 100, 12, 1),
+    "large":  (20, 1000, 24, 1)
+}
+
+DEFAULT_RUNS      = 5
+DEFAULT_TOLERANCE = 0.25
+
+# timings closer to the baseline than this are noise, not regressions
+MIN_TIME_DELTA = 0.002
+
+class Context:
+
+    def __init__(self, mock):
+        self.mock     = mock
+        board         = next(iter(mock.boards.values()))
+        self.board_id = board["id"]
+        lists         = [l for l in mock.lists.values()
+                if l["idBoard"] == self.board_id]
+        self.list_id  = lists[0]["id"]
+        self.other_id = lists[-1]["id"]
+        self.card_ids = [c["id"] for c in mock.cards.values()
+                if c["idList"] == self.list_id]
+        self.labels   = [l for l in mock.labels.values()
+                if l["idBoard"] == self.board_id]
+    #end function
+
+    def cli(self, *argv):
+        # run a CLI command in-process and return its output
+        with contextlib.redirect_stdout(io.StringIO()) as stdout, \
+                contextlib.redirect_stderr(io.StringIO()) as stderr:
+            status = Cli.run({}, list(argv))
+        if status != Cli.EXIT_OK:
+            raise RuntimeError("'%s' failed: %s" % (" ".join(argv),
+                stderr.getvalue().strip().splitlines()[-1]))
+        return stdout.getvalue()
+    #end function
+
+#end class
+
+# SCENARIOS
+#
+# Each scenario is a tuple (name, setup, run). setup prepares the state the
+# measurement depends on, for example a warm cache, and is not measured.
+
+def sequential_gets(ctx, count=50, **client_options):
+    # One request after the other, so that connection setup shows up in
+    # the time per request instead of hiding behind concurrency.
+    client = Client("key", "token", url=tci()._url, rate_limiter=False,
+            default=False, **client_options)
+
+    with client, client.activate():
+        for i in range(count):
+            List({"id": ctx.list_id}).cards()
+    #end with
+#end function
+
+def large_board(ctx):
+    # A board with a cards response of a few MB, many times the chunk size
+    # of streamed reads. The reads are warmed up, so that the mock serves
+    # rendered bytes and only the client's allocations are measured.
+    ctx.mock.populate(1, 4, 2500, 0)
+    ctx.large_id = max(ctx.mock.boards)
+
+    Board({"id": ctx.large_id}).snapshot()
+    sum(1 for card in Board({"id": ctx.large_id}).iter_cards())
+#end function
+
+def move_and_list(ctx):
+    # The cached listing of a list must not outlive a move out of it.
+    ctx.cli("move", "card", "--card-id", ctx.card_ids[0], "--list-id",
+            ctx.other_id)
+
+    if ctx.card_ids[0] in ctx.cli("list", "cards", "--list-id", ctx.list_id):
+        raise RuntimeError("'list cards' shows a card that was moved away.")
+#end function
+
+def synced_mirror(ctx):
+    ctx.mirror = Mirror(os.path.join(os.path.expanduser("~"),
+        "mirror.sqlite"))
+    ctx.mirror.sync(ctx.board_id)
+#end function
+
+def walk_offline(ctx):
+    # models read through the mirror must not make a single request
+    with MirrorClient(ctx.mirror).activate():
+        board = Board.by_id(ctx.board_id)
+
+        for list_ in board.lists():
+            for card in list_.cards(fields=("id", "name", "idLabels")):
+                card.idLabels
+        #end for
+    #end with
+#end function
+
+def bulk_file(ctx):
+    filename = os.path.join(os.path.expanduser("~"), "cards.jsonl")
+    with open(filename, "w", encoding="utf-8") as fp:
+        for i in range(20):
+            fp.write(json.dumps({"name": "Bulk %d" % i,
+                "labels": ctx.labels[i % len(ctx.labels)]["name"]}) + "\n")
+    return filename
+#end function
+
+SCENARIOS = [
+    ("cli-list-boards", None,
+        lambda ctx: ctx.cli("list", "boards", "--no-cache")),
+    ("cli-list-lists", None,
+        lambda ctx: ctx.cli("list", "lists", "--board-id", ctx.board_id,
+            "--no-cache")),
+    ("cli-list-cards", None,
+        lambda ctx: ctx.cli("list", "cards", "--list-id", ctx.list_id,
+            "--no-cache")),
+    ("cli-list-cards-cached",
+        lambda ctx: ctx.cli("list", "cards", "--list-id", ctx.list_id),
+        lambda ctx: ctx.cli("list", "cards", "--list-id", ctx.list_id)),
+    ("cli-list-labels", None,
+        lambda ctx: ctx.cli("list", "labels", "--board-id", ctx.board_id,
+            "--no-cache")),
+    ("cli-list-tree", None,
+        lambda ctx: ctx.cli("list", "tree", "--board-id", ctx.board_id,
+            "--no-cache")),
+    ("cli-create-card", None,
+        lambda ctx: ctx.cli("create", "card", "--list-id", ctx.list_id,
+            "--name", "Benchmark", "--labels", ctx.labels[0]["id"],
+            "--comment", "Created by the benchmark")),
+    ("cli-create-card-board", None,
+        lambda ctx: ctx.cli("create", "card", "--list-id", ctx.list_id,
+            "--board-id", ctx.board_id, "--name", "Benchmark", "--labels",
+            ctx.labels[0]["name"])),
+    ("cli-create-card-position", None,
+        lambda ctx: ctx.cli("create", "card", "--list-id", ctx.list_id,
+            "--name", "Benchmark", "--position", "1")),
+    ("cli-create-cards-bulk", None,
+        lambda ctx: ctx.cli("create", "cards", "--list-id", ctx.list_id,
+            "--from-file", bulk_file(ctx), "--jobs", "4")),
+    ("cli-move-card", None,
+        lambda ctx: ctx.cli("move", "card", "--card-id", ctx.card_ids[0],
+            "--list-id", ctx.other_id)),
+    ("cli-move-card-cached",
+        lambda ctx: ctx.cli("list", "cards", "--list-id", ctx.list_id),
+        move_and_list),
+    ("cli-move-cards", None,
+        lambda ctx: ctx.cli("move", "cards", "--from-list", ctx.list_id,
+            "--to-list", ctx.other_id, "--label", ctx.labels[0]["name"],
+            "--jobs", "4")),
+    ("cli-delete-card", None,
+        lambda ctx: ctx.cli("delete", "card", "--card-id", ctx.card_ids[0])),
+    ("cli-sync-full", None,
+        lambda ctx: ctx.cli("sync", "--board-id", ctx.board_id)),
+    ("cli-sync-incremental",
+        lambda ctx: (ctx.cli("sync", "--board-id", ctx.board_id),
+            ctx.cli("move", "card", "--card-id", ctx.card_ids[0],
+                "--list-id", ctx.other_id)),
+        lambda ctx: ctx.cli("sync", "--board-id", ctx.board_id)),
+    ("cli-search",
+        lambda ctx: ctx.cli("sync", "--board-id", ctx.board_id),
+        lambda ctx: ctx.cli("search", "card list")),
+    ("cli-export", None,
+        lambda ctx: ctx.cli("export", "--all-boards", "--out",
+            os.path.join(os.path.expanduser("~"), "backup.jsonl.gz"))),
+    ("lib-board-snapshot", None,
+        lambda ctx: Board({"id": ctx.board_id}).snapshot()),
+    ("lib-iter-cards", None,
+        lambda ctx: sum(1 for card in
+            Board({"id": ctx.board_id}).iter_cards())),
+    ("lib-memory-snapshot", large_board,
+        lambda ctx: Board({"id": ctx.large_id}).snapshot()),
+    ("lib-memory-iter-cards", large_board,
+        lambda ctx: sum(1 for card in
+            Board({"id": ctx.large_id}).iter_cards())),
+    ("lib-mirror-offline", synced_mirror, walk_offline),
+    ("lib-load-fields",
+        None,
+        lambda ctx: Card.load_fields([Card({"id": card_id})
+            for card_id in ctx.card_ids[:50]], ["desc", "due"])),
+    ("lib-requests-pooled", None,
+        lambda ctx: sequential_gets(ctx)),
+    ("lib-requests-unpooled", None,
+        lambda ctx: sequential_gets(ctx, keep_alive=False)),
+    ("lib-list-cards", None,
+        lambda ctx: List({"id": ctx.list_id}).cards(
+            fields=("id", "name", "pos"))),
+]
+
+# Upper limits for the number of requests of a scenario, checked on every
+# run without injected errors, independent of any baseline.
+REQUEST_BUDGETS = {
+    "cli-create-card":          4,
+    "cli-create-card-board":    2,
+    "cli-create-card-position": 2,
+    "lib-mirror-offline":       0
+}
+
+# RUNNER
+
+def run_once(scenario, options, trace=False):
+    name, setup, run = scenario
+
+    lists, cards, labels, comments = options["size"]
+
+    mock = MockTrello(lists=lists, cards=cards, labels=labels,
+            comments=comments, latency=options["latency"],
+            error_rate=options["error_rate"], seed=1)
+    url  = mock.start()
+    home = tempfile.mkdtemp(prefix="trello-bench-")
+
+    os.environ["HOME"] = home
+    os.makedirs(os.path.join(home, ".trello-cli"))
+
+    client = Client("key", "token", url=url, rate_limiter=False,
+            retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.1))
+
+    try:
+        ctx = Context(mock)
+
+        if setup:
+            setup(ctx)
+
+        mock.reset_stats()
+
+        if trace:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        try:
+            run(ctx)
+        finally:
+            elapsed = time.perf_counter() - start
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                peak = None
+        #end try
+
+        stats = mock.stats()
+        stats["time"] = elapsed
+        stats["peak"] = peak
+
+        return stats
+    finally:
+        client.close()
+        mock.stop()
+        shutil.rmtree(home, ignore_errors=True)
+    #end try
+#end function
+
+def measure(scenario, options):
+    timings = []
+
+    for i in range(options["runs"]):
+        stats = run_once(scenario, options)
+        timings.append(stats["time"])
+    #end for
+
+    # memory tracing slows things down, so it gets a run of its own
+    peak = run_once(scenario, options, trace=True)["peak"]
+
+    return {
+        "time":           statistics.median(timings),
+        "requests":       stats["requests"],
+        "errors":         stats["errors"],
+        "request_bytes":  stats["request_bytes"],
+        "response_bytes": stats["response_bytes"],
+        "peak":           peak,
+        "endpoints":      stats["endpoints"]
+    }
+#end function
+
+def compare(name, result, baseline, tolerance):
+    # Returns a list of regressions of the result against the baseline.
+    # Request counts must not grow at all, everything else may grow within
+    # the tolerance.
+    regressions = []
+
+    if name not in baseline:
+        return regressions
+
+    before = baseline[name]
+
+    if result["requests"] > before["requests"]:
+        regressions.append("requests %d -> %d" %
+                (before["requests"], result["requests"]))
+
+    for key, unit, scale in [("time", "ms", 1000.0),
+            ("response_bytes", "KB", 1/1024.0), ("peak", "KB", 1/1024.0)]:
+        if key == "time" and result[key] - before[key] < MIN_TIME_DELTA:
+            continue
+        if result[key] > before[key] * (1.0 + tolerance):
+            regressions.append("%s %.1f%s -> %.1f%s" % (key,
+                before[key] * scale, unit, result[key] * scale, unit))
+    #end for
+
+    return regressions
+#end function
+
+def usage():
+    sys.stdout.write(
+        "Usage: run.py [OPTIONS] [PATTERN ...]                             \n"
+        "                                                                  \n"
+        "Runs CLI commands and library calls against a local mock Trello   \n"
+        "server and reports wall time, request count, bytes transferred    \n"
+        "and peak memory per scenario. Patterns select scenarios by name,  \n"
+        "e.g. 'cli-list-*'.                                                \n"
+        "                                                                  \n"
+        "OPTIONS:                                                          \n"
+        "                                                                  \n"
+        " --size <name>     Board size: small, medium or large (small).    \n"
+        " --latency <ms>    Delay added to each response (0).              \n"
+        " --error-rate <f>  Fraction of requests that fail with 500 (0.0). \n"
+        " --runs <n>        Timed runs per scenario, the median is shown   \n"
+        "                   (%d).                                           \n"
+        " --save <file>     Store the results as a baseline.               \n"
+        " --baseline <file> Compare against a stored baseline and fail on  \n"
+        "                   regressions.                                   \n"
+        " --tolerance <f>   Allowed growth of time, bytes and memory over  \n"
+        "                   the baseline (%.2f).                           \n"
+        " --list            List the scenarios and exit.                   \n"
+        "                                                                  \n"
+        % (DEFAULT_RUNS, DEFAULT_TOLERANCE)
+    )
+#end function
+
+def main():
+    options = {
+        "size":       SIZES["small"],
+        "latency":    0.0,
+        "error_rate": 0.0,
+        "runs":       DEFAULT_RUNS
+    }
+    save      = None
+    baseline  = None
+    tolerance = DEFAULT_TOLERANCE
+
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "h",
+                ["help", "size=", "latency=", "error-rate=", "runs=",
+                    "save=", "baseline=", "tolerance=", "list"])
+        for o, v in opts:
+            if o in ["-h", "--help"]:
+                usage()
+                return 0
+            elif o == "--size":
+                options["size"] = SIZES[v]
+            elif o == "--latency":
+                options["latency"] = float(v) / 1000.0
+            elif o == "--error-rate":
+                options["error_rate"] = float(v)
+            elif o == "--runs":
+                options["runs"] = max(1, int(v))
+            elif o == "--save":
+                save = v
+            elif o == "--baseline":
+                baseline = v
+            elif o == "--tolerance":
+                tolerance = float(v)
+            elif o == "--list":
+                for name, setup, run in SCENARIOS:
+                    print(name)
+                return 0
+        #end for
+    except (getopt.GetoptError, ValueError, KeyError):
+        usage()
+        return 1
+    #end try
+
+    scenarios = [s for s in SCENARIOS if not args or
+            any(fnmatch.fnmatch(s[0], pattern) for pattern in args)]
+
+    reference = {}
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as fp:
+            reference = json.load(fp)["results"]
+    #end if
+
+    # the first requests pay for importing and setting up the HTTP stack
+    run_once(SCENARIOS[0], dict(options, runs=1))
+
+    results = {}
+    failed  = False
+
+    print("| %-26s | %9s | %8s | %10s | %10s | %10s |" % ("scenario",
+        "time ms", "requests", "req KB", "resp KB", "peak KB"))
+
+    for scenario in scenarios:
+        name = scenario[0]
+
+        try:
+            result = measure(scenario, options)
+        except Exception as e:
+            print("| %-26s | FAILED: %s" % (name, str(e)))
+            failed = True
+            continue
+        #end try
+
+        results[name] = result
+
+        print("| %-26s | %9.1f | %8d | %10.1f | %10.1f | %10.1f |" % (name,
+            result["time"] * 1000.0, result["requests"],
+            result["request_bytes"] / 1024.0,
+            result["response_bytes"] / 1024.0,
+            result["peak"] / 1024.0))
+
+        for regression in compare(name, result, reference, tolerance):
+            print("  REGRESSION: %s" % regression)
+            failed = True
+        #end for
+
+        budget = REQUEST_BUDGETS.get(name)
+
+        if budget is not None and not options["error_rate"] and \
+                result["requests"] > budget:
+            print("  OVER BUDGET: %d requests, at most %d allowed" %
+                    (result["requests"], budget))
+            failed = True
+        #end if
+    #end for
+
+    if save:
+        with open(save, "w", encoding="utf-8") as fp:
+            json.dump({"options": {"size": options["size"],
+                "latency": options["latency"],
+                "error_rate": options["error_rate"]},
+                "results": results}, fp, indent=4, sort_keys=True)
+        #end with
+    #end if
+
+    return 1 if failed else 0
+#end function
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,30 @@
 #-*- encoding: utf-8 -*-
 
-from .client import Client
-from .board  import Board
-from .list   import List
-from .card   import Card
-from .label  import Label
-from .cli    import Cli
-from .config import Config
+import importlib
 
+# The public classes are imported on first access, so that importing the
+# package (which the trello-cli entry point does) stays cheap.
+_EXPORTS = {
+    "Client":      ".client",
+    "AsyncClient": ".asyncclient",
+    "Board":       ".board",
+    "List":        ".list",
+    "Card":        ".card",
+    "Label":       ".label",
+    "Cli":         ".cli",
+    "Config":      ".config"
+}
+
+def __getattr__(name):
+    if not name in _EXPORTS:
+        raise AttributeError("module '%s' has no attribute '%s'" %
+                (__name__, name))
+
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+#end function
+
+def __dir__():
+    # not list(), the submodule "list" shadows it in this namespace
+    return sorted(set(globals()).union(_EXPORTS))
@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import functools
+from .client import tci
+
+def atci():
+    return AsyncClient.instance()
+
+class AsyncClient:
+
+    INSTANCE = None
+
+    def __init__(self, client=None, max_concurrency=8):
+        from concurrent.futures import ThreadPoolExecutor
+
+        # without a client of its own, every call goes to the client that
+        # is active in the calling task
+        self._client   = client
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                thread_name_prefix="trello")
+        AsyncClient.INSTANCE = self
+    #end function
+
+    @classmethod
+    def instance(cls):
+        return AsyncClient.INSTANCE
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        import asyncio
+
+        # waiting for the workers must not block the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+    #end function
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def _execute(self, path, verb=None, params=None, data=None):
+        # The blocking client runs on a bounded pool of worker threads, so at
+        # most max_concurrency requests are in flight at any time. The call
+        # runs in a copy of the task's context, so that the worker sees the
+        # caches and clients activated in the task.
+        import asyncio
+        import contextvars
+
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run,
+                self.client()._execute, path, verb=verb, params=params,
+                    data=data)
+        return await loop.run_in_executor(self._executor, call)
+    #end function
+
+    def client(self):
+        return self._client or tci()
+
+    def _invalidate(self, *fragments):
+        self.client()._invalidate(*fragments)
+
+#end class
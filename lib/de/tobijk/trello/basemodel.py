@@ -25,13 +25,91 @@
 
 import json
 from .client import tci 
+from .error  import TrelloStrictModeError
+
+class DeferredList(list):
+
+    # A collection that a pending batch fills in. Reading it sends the batch
+    # first, so that it is not mistaken for an empty result inside a
+    # batch() block.
+
+    def __init__(self, client):
+        super().__init__()
+        self._client  = client
+        self._pending = True
+    #end function
+
+    def fill(self, items):
+        self.extend(items)
+        self._pending = False
+    #end function
+
+    def _wait(self):
+        if self._pending:
+            self._client.flush()
+
+    def __iter__(self):
+        self._wait()
+        return super().__iter__()
+
+    def __reversed__(self):
+        self._wait()
+        return super().__reversed__()
+
+    def __len__(self):
+        self._wait()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._wait()
+        return super().__getitem__(index)
+
+    def __contains__(self, item):
+        self._wait()
+        return super().__contains__(item)
+
+    def __eq__(self, other):
+        self._wait()
+        return super().__eq__(other)
+
+    def __repr__(self):
+        self._wait()
+        return super().__repr__()
+
+#end class
 
 class BaseModel(dict):
 
+    # When set, reading a field that has not been loaded raises an error
+    # instead of silently fetching the whole object from the server.
+    STRICT = False
+
+    @classmethod
+    def by_id(cls, obj_id, fields=None):
+        obj = cls({"id": obj_id})
+        tci()._fetch(cls.PATH + "/" + obj_id, obj.update,
+                params=cls._projection(fields))
+        return obj
+    #end function
+
     @classmethod
-    def by_id(cls, obj_id):
-        result = tci()._execute(cls.PATH + "/" + obj_id)
-        return cls(result)
+    def load_fields(cls, objects, fields):
+        # Fill in the given fields on all objects that lack any of them with
+        # batched requests instead of one refresh per object.
+        with tci().batch():
+            for obj in objects:
+                if not all(name in obj for name in fields):
+                    obj.refresh(fields)
+            #end for
+        #end with
+    #end function
+
+    @staticmethod
+    def _projection(fields, params=None):
+        params = dict(params or {})
+        if fields:
+            params["fields"] = ",".join(fields)
+        return params
     #end function
 
     def __init__(self, data):
@@ -40,7 +118,18 @@ class BaseModel(dict):
     def __getattr__(self, name):
         if not name in self:
             if self.get("id", None) is not None:
-                self.refresh()
+                # the value may still be waiting in a pending batch
+                tci().flush()
+                if not name in self:
+                    if BaseModel.STRICT:
+                        raise TrelloStrictModeError(
+                            "field '%s' of %s '%s' was not loaded." %
+                                (name, type(self).__name__, self["id"]))
+                    #end if
+                    self.refresh()
+                    tci().flush()
+            #end if
+        #end if
         return self[name]
     #end function
 
@@ -74,9 +163,9 @@ class BaseModel(dict):
         return params
     #end function
 
-    def refresh(self):
-        data = tci()._execute(self.PATH + "/" + self.id)
-        self.update(data)
+    def refresh(self, fields=None):
+        tci()._fetch(self.PATH + "/" + self.id, self.update,
+                params=self._projection(fields))
     #end function
 
 #end class
@@ -24,8 +24,10 @@
 #
 
 from .client import tci
-from .basemodel import BaseModel
+from .asyncclient import atci
+from .basemodel import BaseModel, DeferredList
 from .list import List
+from .card import Card
 from .label import Label
 
 class Board(BaseModel):
@@ -33,7 +35,29 @@ class Board(BaseModel):
     PATH = "/boards"
 
     @classmethod
-    def all(cls, filter="open"):
+    def all(cls, filter="open", fields=("id", "name")):
+        params = cls._all_params(filter, fields)
+        boards_data = tci()._execute("/members/me/boards", params=params)
+        return [Board(data) for data in boards_data]
+    #end function
+
+    @classmethod
+    def iter_all(cls, filter="open", fields=("id", "name")):
+        for board_data in tci()._stream("/members/me/boards",
+                params=cls._all_params(filter, fields)):
+            yield Board(board_data)
+    #end function
+
+    @classmethod
+    async def all_async(cls, filter="open", fields=("id", "name")):
+        params = cls._all_params(filter, fields)
+        boards_data = await atci()._execute("/members/me/boards",
+                params=params)
+        return [Board(data) for data in boards_data]
+    #end function
+
+    @classmethod
+    def _all_params(cls, filter, fields):
         valid_filters = [
             "all",
             "closed",
@@ -47,24 +71,126 @@ class Board(BaseModel):
         if not filter in valid_filters:
             raise ValueError("invalid filter name '%s'" % filter)
 
-        params = {"filter": filter, "fields": "id,name"}
-
-        boards_data = tci()._execute("/members/me/boards", params=params)
-        return [Board(data) for data in boards_data]
+        return cls._projection(fields, {"filter": filter})
     #end function
 
     def __init__(self, data=None):
         super().__init__(data or {})
 
-    def lists(self):
-        lists_data = tci()._execute(self.PATH + "/" + self.id + List.PATH)
+    def lists(self, fields=None):
+        lists = DeferredList(tci())
+        tci()._fetch(self.PATH + "/" + self.id + List.PATH,
+                lambda lists_data: lists.fill(map(List, lists_data)),
+                params=self._projection(fields))
+        return lists
+    #end function
+
+    def iter_lists(self, fields=None, filter=None):
+        params = self._projection(fields,
+                {"filter": filter} if filter else None)
+        for list_data in tci()._stream(self.PATH + "/" + self.id + List.PATH,
+                params=params):
+            yield List(list_data)
+    #end function
+
+    def iter_cards(self, fields=None, filter="open"):
+        params = self._projection(fields, {"filter": filter})
+        for card_data in tci()._stream(self.PATH + "/" + self.id + Card.PATH,
+                params=params):
+            yield Card(card_data)
+    #end function
+
+    def iter_actions(self, filter=None, since=None, page_size=1000):
+        # Actions are returned newest first, in pages of at most 1000
+        # entries. Older pages are requested with the "before" parameter.
+        params = {"limit": page_size}
+
+        if filter:
+            params["filter"] = filter
+        if since:
+            params["since"] = since
+
+        while True:
+            count = 0
+
+            for action in tci()._stream(self.PATH + "/" + self.id +
+                    "/actions", params=params):
+                count += 1
+                params["before"] = action["id"]
+                yield action
+            #end for
+
+            if count < page_size:
+                break
+        #end while
+    #end function
+
+    async def lists_async(self, fields=None):
+        lists_data = await atci()._execute(self.PATH + "/" + self.id +
+                List.PATH, params=self._projection(fields))
         return [List(data) for data in lists_data]
     #end function
 
-    def labels(self):
-        labels_data = tci()._execute(self.PATH + "/" + self.id + Label.PATH)
+    def labels(self, fields=None):
+        labels_data = tci()._execute(self.PATH + "/" + self.id + Label.PATH,
+                params=self._projection(fields))
+        return [Label(data) for data in labels_data]
+    #end function
+
+    def iter_labels(self, fields=None):
+        for label_data in tci()._stream(self.PATH + "/" + self.id +
+                Label.PATH, params=self._projection(fields)):
+            yield Label(label_data)
+    #end function
+
+    async def labels_async(self, fields=None):
+        labels_data = await atci()._execute(self.PATH + "/" + self.id +
+                Label.PATH, params=self._projection(fields))
         return [Label(data) for data in labels_data]
     #end function
 
+    def snapshot(self, lists="open", cards="open", labels="all"):
+        # Load the board with its lists, cards and labels in a single
+        # request. The "lists", "cards" and "labels" entries are replaced
+        # with model objects, each list carries its cards in "cards" and each
+        # card its labels in "labels".
+        params = {"lists": lists, "cards": cards, "labels": labels}
+        data   = tci()._execute(self.PATH + "/" + self.id, params=params)
+
+        labels_by_id = {}
+        for label_data in data.get("labels", []):
+            label = Label(label_data)
+            labels_by_id[label["id"]] = label
+        #end for
+
+        lists_by_id = {}
+        for list_data in data.get("lists", []):
+            list_ = List(list_data)
+            list_["cards"] = []
+            lists_by_id[list_["id"]] = list_
+        #end for
+
+        all_cards = []
+        for card_data in data.get("cards", []):
+            card = Card(card_data)
+            card["labels"] = [labels_by_id.get(label["id"], Label(label))
+                    for label in card_data.get("labels", [])]
+            if card.get("idList") in lists_by_id:
+                lists_by_id[card["idList"]]["cards"].append(card)
+            all_cards.append(card)
+        #end for
+
+        for list_ in lists_by_id.values():
+            list_["cards"].sort(key=lambda card: card.get("pos", 0))
+
+        data["lists"]  = sorted(lists_by_id.values(),
+                key=lambda list_: list_.get("pos", 0))
+        data["cards"]  = all_cards
+        data["labels"] = list(labels_by_id.values())
+
+        self.update(data)
+        return self
+    #end function
+
 #end class
 
@@ -0,0 +1,58 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+def run_parallel(func, items, jobs=4, progress=None):
+    # Calls func on every item with at most `jobs` calls in flight and returns
+    # a list of (item, result, error) tuples in the order of the input. A
+    # failing item does not stop the others, whatever it raises, so that a
+    # single malformed row ends up in the report instead of aborting the
+    # batch. The calls see the client that is active in the caller.
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    results = [None] * len(items)
+    done    = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = dict((executor.submit(contextvars.copy_context().run,
+            func, item), i)
+                for i, item in enumerate(items))
+
+        for future in as_completed(futures):
+            i = futures[future]
+
+            try:
+                results[i] = (items[i], future.result(), None)
+            except Exception as e:
+                results[i] = (items[i], None, e)
+
+            done += 1
+            if progress:
+                progress(done, len(items))
+        #end for
+    #end with
+
+    return results
+#end function
@@ -0,0 +1,224 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+class ResponseCache:
+
+    # Parsed entries shared by all instances in a process, so that a long-lived
+    # process like the daemon does not re-read and re-parse files on each hit.
+    MEMORY_ENTRIES = 512
+
+    _memory      = OrderedDict()
+    _memory_lock = threading.Lock()
+
+    # seconds a cached response stays fresh, by the resource it lists or is
+    DEFAULT_TTLS = {
+        "boards":  300,
+        "lists":   300,
+        "labels":  3600,
+        "cards":   60,
+        "members": 300
+    }
+
+    def __init__(self, folder, ttls=None, max_size=16*1024*1024,
+            stale_while_revalidate=False, max_stale=86400, refresh=False):
+        self._folder   = folder
+        self._ttls     = dict(ResponseCache.DEFAULT_TTLS, **(ttls or {}))
+        self._max_size = max_size
+        self._swr      = stale_while_revalidate
+        self._stale    = max_stale
+        self._refresh  = refresh
+        self._lock     = threading.Lock()
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+    #end function
+
+    def lookup(self, path, params):
+        # Returns a tuple (data, fresh) where data is None on a miss. Stale
+        # entries are only returned in stale-while-revalidate mode, with fresh
+        # set to False, and the caller is expected to revalidate them.
+        if self._refresh:
+            return None, False
+
+        filename = self._filename(path, params)
+
+        try:
+            st    = os.stat(filename)
+            entry = self._recall(filename, st)
+
+            if entry is None:
+                with open(filename, "r", encoding="utf-8") as fp:
+                    header = json.loads(fp.readline())
+                    data   = json.loads(fp.readline())
+                self._remember(filename, st, header, data)
+            else:
+                header, data = entry
+            #end if
+
+            # bump the mtime which is used for LRU eviction
+            os.utime(filename)
+        except (OSError, ValueError):
+            return None, False
+        #end try
+
+        age = time.time() - header["stored"]
+        ttl = self._ttl(path)
+
+        if age < ttl:
+            return data, True
+        if self._swr and age < ttl + self._stale:
+            return data, False
+
+        return None, False
+    #end function
+
+    def store(self, path, params, data):
+        filename = self._filename(path, params)
+        header   = {"path": path, "query": self._query(params),
+                "stored": time.time()}
+        tmpname  = "%s.%d.%d" % (filename, os.getpid(),
+                threading.get_ident())
+
+        with open(tmpname, "w", encoding="utf-8") as fp:
+            fp.write(json.dumps(header) + "\n")
+            fp.write(json.dumps(data, ensure_ascii=False) + "\n")
+        os.replace(tmpname, filename)
+        self._forget(filename)
+
+        self._evict()
+    #end function
+
+    def invalidate(self, *fragments):
+        # drop all entries whose path or query contains one of the fragments
+        for filename in self._entries():
+            try:
+                with open(filename, "r", encoding="utf-8") as fp:
+                    header = json.loads(fp.readline())
+                url = header["path"] + "?" + header.get("query", "")
+                if any(f in url for f in fragments):
+                    self._forget(filename)
+                    os.unlink(filename)
+            except (OSError, ValueError, KeyError):
+                pass
+        #end for
+    #end function
+
+    def clear(self):
+        self.invalidate("")
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total   = 0
+
+            for filename in self._entries():
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, filename))
+                total += st.st_size
+            #end for
+
+            entries.sort()
+
+            while entries and total > self._max_size:
+                mtime, size, filename = entries.pop(0)
+                self._forget(filename)
+                try:
+                    os.unlink(filename)
+                except OSError:
+                    pass
+                total -= size
+            #end while
+        #end with
+    #end function
+
+    @classmethod
+    def _recall(cls, filename, st):
+        # Files are only ever replaced, never rewritten in place, so a change
+        # of inode or size means another process stored a new response.
+        with cls._memory_lock:
+            entry = cls._memory.get(filename)
+            if entry is None:
+                return None
+            if entry[0] != (st.st_ino, st.st_size):
+                del cls._memory[filename]
+                return None
+            cls._memory.move_to_end(filename)
+            return entry[1], entry[2]
+        #end with
+    #end function
+
+    @classmethod
+    def _remember(cls, filename, st, header, data):
+        with cls._memory_lock:
+            cls._memory[filename] = ((st.st_ino, st.st_size), header, data)
+            cls._memory.move_to_end(filename)
+            while len(cls._memory) > cls.MEMORY_ENTRIES:
+                cls._memory.popitem(last=False)
+        #end with
+    #end function
+
+    @classmethod
+    def _forget(cls, filename):
+        with cls._memory_lock:
+            cls._memory.pop(filename, None)
+
+    def _entries(self):
+        return [os.path.join(self._folder, name)
+                for name in os.listdir(self._folder) if name.endswith(".json")]
+
+    @staticmethod
+    def _query(params):
+        return "&".join("%s=%s" % (k, v) for k, v in
+                sorted((params or {}).items()) if k not in ["key", "token"])
+    #end function
+
+    def _filename(self, path, params):
+        # The token is part of the key so that accounts never see each
+        # other's data. The key itself is not needed, it belongs to the app.
+        items = sorted((k, str(v)) for k, v in (params or {}).items()
+                if k != "key")
+        key = hashlib.sha1(json.dumps([path, items]).encode("utf-8"))
+        return os.path.join(self._folder, key.hexdigest() + ".json")
+    #end function
+
+    def _ttl(self, path):
+        for segment in reversed(path.strip("/").split("/")):
+            if segment in self._ttls:
+                return self._ttls[segment]
+        return 0
+    #end function
+
+#end class
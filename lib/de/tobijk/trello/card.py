@@ -24,6 +24,7 @@
 #
 
 from .client import tci
+from .asyncclient import atci
 from .basemodel import BaseModel
 
 class Card(BaseModel):
@@ -38,6 +39,9 @@ class Card(BaseModel):
 
     PATH = "/cards"
 
+    # fragments identifying cached responses that may contain card data
+    CACHED = ["/cards", "cards="]
+
     def __init__(self, data=None):
         super().__init__(data or {})
 
@@ -47,16 +51,77 @@ class Card(BaseModel):
             "text": text
         }
 
-        tci()._execute(self.PATH + "/" + self.id + "/actions/comments",
+        # returns the comment action, or None if it went to the journal
+        return tci()._journaled({"op": "comment", "card": self.id,
+            "text": text}, lambda: tci()._execute(self.PATH + "/" + self.id +
+                    "/actions/comments", verb="POST", params=params))
+    #end function
+
+    async def add_comment_async(self, text):
+        params = {
+            "id": self.id,
+            "text": text
+        }
+
+        await atci()._execute(self.PATH + "/" + self.id + "/actions/comments",
                     verb="POST", params=params)
     #end function
 
     def delete(self):
-        tci()._execute(self.PATH + "/" + self.id, verb="DELETE")
+        tci()._journaled({"op": "delete", "card": self.id},
+                lambda: tci()._execute(self.PATH + "/" + self.id,
+                    verb="DELETE"))
+        tci()._invalidate(*self.CACHED)
+    #end function
+
+    async def delete_async(self):
+        await atci()._execute(self.PATH + "/" + self.id, verb="DELETE")
+        atci()._invalidate(*self.CACHED)
+    #end function
+
+    def archive(self):
+        params = {"closed": "true"}
+        tci()._journaled({"op": "archive", "card": self.id},
+                lambda: tci()._execute(self.PATH + "/" + self.id,
+                    params=params, verb="PUT"))
+        tci()._invalidate(*self.CACHED)
+    #end function
+
+    async def archive_async(self):
+        params = {"closed": "true"}
+        await atci()._execute(self.PATH + "/" + self.id, params=params,
+                verb="PUT")
+        atci()._invalidate(*self.CACHED)
+    #end function
 
     def move_to(self, list_id):
         params = {"idList": list_id }
-        tci()._execute(self.PATH + "/" + self.id, params=params, verb="PUT")
+        tci()._journaled({"op": "move", "card": self.id, "list": list_id},
+                lambda: tci()._execute(self.PATH + "/" + self.id,
+                    params=params, verb="PUT"))
+        tci()._invalidate(*self.CACHED)
+    #end function
+
+    async def move_to_async(self, list_id):
+        params = {"idList": list_id }
+        await atci()._execute(self.PATH + "/" + self.id, params=params,
+                verb="PUT")
+        atci()._invalidate(*self.CACHED)
+    #end function
+
+    def set_position(self, pos):
+        params = {"pos": pos}
+        tci()._journaled({"op": "position", "card": self.id, "pos": pos},
+                lambda: tci()._execute(self.PATH + "/" + self.id,
+                    params=params, verb="PUT"))
+        tci()._invalidate(*self.CACHED)
+    #end function
+
+    async def set_position_async(self, pos):
+        params = {"pos": pos}
+        await atci()._execute(self.PATH + "/" + self.id, params=params,
+                verb="PUT")
+        atci()._invalidate(*self.CACHED)
     #end function
 
 #end class
@@ -24,43 +24,283 @@
 #
 
 import sys
+import json
 import getopt
-import argparse
+import threading
+import contextlib
 
-from dateutil.parser import parse as dateparse
-
-from .client import Client as TrelloClient
+from .client import Client as TrelloClient, tci
+from .ratelimit import RateLimiter
+from .retry  import RetryPolicy
 from .config import Config
-from .error  import TrelloBaseError, CliInvocationError, TrelloClientError
+from .error  import TrelloBaseError, CliInvocationError, TrelloClientError, \
+        TrelloConfigUnusable
 from .board  import Board
 from .list   import List
 from .card   import Card
-from .label  import Label
+from .bulk   import run_parallel
+
+def dateparse(text):
+    # dateutil is slow to import and only needed for due dates
+    from dateutil.parser import parse
+    return parse(text)
+#end function
+
+def board_label_ids(list_, board_id=None):
+    # Maps the ids and names of the labels on the list's board to their ids,
+    # with one request for the list and one for the labels. The list is not
+    # looked up if the caller knows its board.
+    if board_id:
+        list_.idBoard = board_id
+    else:
+        try:
+            list_.update(List.by_id(list_.id, fields=("id", "idBoard")))
+            list_.idBoard
+        except TrelloClientError as e:
+            raise CliInvocationError("failed to locate the specified list.")
+    #end if
+
+    board_labels = {}
+
+    for label in Board({"id": list_.idBoard}).labels(fields=("id", "name")):
+        board_labels[label.id] = label.id
+        if label.get("name"):
+            board_labels.setdefault(label.name, label.id)
+    #end for
+
+    return board_labels
+#end function
+
+# options shared by the commands that select cards from a list in bulk
+BULK_OPTIONS = ["from-list=", "label=", "due-before=", "jobs=", "dry-run",
+        "report=", "resume="]
+
+def parse_bulk_option(options, o, v):
+    if o == "--due-before":
+        from datetime import timezone
+
+        try:
+            due = dateparse(v.strip())
+        except (ValueError, OverflowError):
+            raise CliInvocationError("could not parse date for --due-before.")
+        # Trello due dates are in UTC
+        if due.tzinfo is None:
+            due = due.replace(tzinfo=timezone.utc)
+        options["due-before"] = due
+    elif o == "--jobs":
+        try:
+            options["jobs"] = max(1, int(v.strip()))
+        except ValueError:
+            raise CliInvocationError("expected an integer argument for --jobs.")
+    elif o == "--dry-run":
+        options["dry-run"] = True
+    elif o in ["--from-list", "--label", "--report", "--resume"]:
+        options[o[2:]] = v.strip()
+    #end if
+#end function
+
+def select_cards(options):
+    # The cards in the list options["from-list"] that pass the label and due
+    # date filters, or the cards that failed in a previous run with --resume.
+    if "resume" in options:
+        return read_report(options["resume"])
+    if not "from-list" in options:
+        raise CliInvocationError("please specify a list id.")
+
+    list_ = List({"id": options["from-list"]})
+
+    try:
+        cards = list_.cards(fields=("id", "name", "idLabels", "due"))
+        tci().flush()
+    except TrelloClientError as e:
+        raise CliInvocationError("failed to locate the specified list.")
+
+    if "label" in options:
+        board_labels = board_label_ids(list_)
+        if not options["label"] in board_labels:
+            raise CliInvocationError("unable to locate or no such label: "
+                    "'%s'" % options["label"])
+        label_id = board_labels[options["label"]]
+        cards    = [c for c in cards if label_id in c.get("idLabels", [])]
+    #end if
+
+    if "due-before" in options:
+        cards = [c for c in cards if c.get("due") and
+                dateparse(c["due"]) < options["due-before"]]
+    #end if
+
+    return cards
+#end function
+
+def apply_to_cards(cards, func, options, done):
+    # Calls func on each card in a pool of workers, which share the client's
+    # rate limit. Failed cards are written to the --report file, which can be
+    # passed to --resume to retry them.
+    if options.get("dry-run"):
+        for card in cards:
+            print("| %s | %-40.40s |" % (card.id, card.get("name", "")))
+        return
+    #end if
+
+    def progress(count, total):
+        sys.stderr.write("\r%s %d/%d cards" % (done, count, total))
+        sys.stderr.flush()
+    #end function
+
+    results = run_parallel(func, cards, jobs=options.get("jobs", 4),
+            progress=progress)
+
+    if results:
+        sys.stderr.write("\n")
+
+    failed = []
+
+    for card, result, error in results:
+        if error is None:
+            print("| %s | %-40.40s |" % (card.id, card.get("name", "")))
+        else:
+            failed.append((card, error))
+            sys.stderr.write("trello-cli: card %s: %s\n" %
+                    (card.id, str(error)))
+        #end if
+    #end for
+
+    if "report" in options:
+        write_report(options["report"], failed)
+
+    if failed:
+        raise CliInvocationError("%d of %d cards could not be %s." %
+                (len(failed), len(results), done))
+    #end if
+#end function
+
+def read_report(filename):
+    cards = []
+
+    try:
+        with open(filename, "r", encoding="utf-8") as fp:
+            for line in fp:
+                if line.strip():
+                    entry = json.loads(line)
+                    cards.append(Card({"id": entry["id"],
+                        "name": entry.get("name", "")}))
+            #end for
+        #end with
+    except OSError as e:
+        raise CliInvocationError("could not read '%s': %s" %
+                (filename, e.strerror))
+    except (ValueError, KeyError) as e:
+        raise CliInvocationError("'%s' is not a report file." % filename)
+    #end try
+
+    return cards
+#end function
+
+def write_report(filename, failed):
+    try:
+        with open(filename, "w", encoding="utf-8") as fp:
+            for card, error in failed:
+                fp.write(json.dumps({"id": card.id,
+                    "name": card.get("name", ""), "error": str(error)},
+                        ensure_ascii=False) + "\n")
+            #end for
+        #end with
+    except OSError as e:
+        raise CliInvocationError("could not write '%s': %s" %
+                (filename, e.strerror))
+    #end try
+#end function
 
 class Cli:
 
     EXIT_OK  = 0
     EXIT_ERR = 1
 
+    # clients of the profiles selected with --profile
+    CLIENTS      = {}
+    CLIENTS_LOCK = threading.Lock()
+
     @staticmethod
     def main():
+        argv = sys.argv[1:]
+
         try:
+            options, command = Cli.global_options(argv)
+
+            # hand the command over to a running daemon, if there is one
+            if command[:1] != ["daemon"]:
+                from .daemon import forward
+
+                status = forward(Config.get_daemon_socket(), argv)
+                if status is not None:
+                    return status
+            #end if
+
             # load config from .trello-cli/config.json
             config = Config.load_config()
 
-            # initialize Trello API client context
-            TrelloClient(config["key"], config["token"])
+            # initialize Trello API client context, commands run with
+            # --profile get their client in execute_command
+            if not options.get("profile"):
+                Cli.create_client(config)
 
             # go figure out what to do
-            Cli.execute_command()
+            Cli.execute_command(config, argv)
         except TrelloBaseError as e:
             sys.stderr.write("trello-cli: %s\n" % str(e))
             sys.exit(Cli.EXIT_ERR)
+        except BrokenPipeError:
+            # the reader went away, e.g. 'trello-cli ... | head'
+            import os
+
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(Cli.EXIT_ERR)
         #end try
 
         return Cli.EXIT_OK
     #end function
 
+    @staticmethod
+    def create_client(config, profile=None, default=True):
+        settings = Config.profile(config, profile)
+
+        # share the request budget with other trello-cli processes
+        if settings.get("rate_limit", True) is False:
+            rate_limiter = False
+        else:
+            rate_limiter = RateLimiter(
+                    state_file=Config.get_rate_limit_file(profile),
+                    **Config.rate_limit_options(settings))
+        #end if
+
+        try:
+            key, token = settings["key"], settings["token"]
+        except KeyError as e:
+            raise TrelloConfigUnusable("no %s in configuration." % e.args[0])
+
+        client = TrelloClient(key, token, rate_limiter=rate_limiter,
+                retry_policy=RetryPolicy(**Config.retry_options(settings)),
+                default=default, **Config.client_options(settings))
+
+        # keep the writes that fail for lack of connectivity for later
+        if settings.get("journal", False):
+            from .journal import Journal
+            client.use_journal(Journal(Config.get_journal_file(profile)))
+
+        return client
+    #end function
+
+    @staticmethod
+    def profile_client(config, profile):
+        # one client per profile, shared by all commands of the process
+        with Cli.CLIENTS_LOCK:
+            if profile not in Cli.CLIENTS:
+                Cli.CLIENTS[profile] = Cli.create_client(config, profile,
+                        default=False)
+            return Cli.CLIENTS[profile]
+        #end with
+    #end function
+
     @staticmethod
     def copyright():
         sys.stdout.write(
@@ -75,7 +315,14 @@ class Cli:
         Cli.copyright()
 
         sys.stdout.write(
-            "Usage: trello-cli <COMMAND> [options] <arguments>                 \n"
+            "Usage: trello-cli [GLOBAL OPTIONS] <COMMAND> [options] <arguments>\n"
+            "                                                                  \n"
+            "GLOBAL OPTIONS:                                                   \n"
+            "                                                                  \n"
+            " --profile <name>  Use the account settings of the named profile. \n"
+            " --stats           Print the count and latency percentiles of the \n"
+            "                   API requests per endpoint to stderr.           \n"
+            " --trace <file>    Append a JSON line per API request to file.    \n"
             "                                                                  \n"
             "COMMANDS:                                                         \n"
             "                                                                  \n"
@@ -83,40 +330,187 @@ class Cli:
             "   create                                                         \n"
             "   delete                                                         \n"
             "   move                                                           \n"
+            "   sort                                                           \n"
+            "   sync                                                           \n"
+            "   search                                                         \n"
+            "   export                                                         \n"
+            "   exec                                                           \n"
+            "   daemon                                                         \n"
+            "   journal                                                        \n"
             "                                                                  \n"
             "Run 'trello-cli <command> --help' for more information.           \n"
         )
     #end function
 
     @staticmethod
-    def execute_command():
+    def execute_command(config=None, argv=None):
+        if argv is None:
+            argv = sys.argv[1:]
+
+        options, argv = Cli.global_options(argv)
+
+        if options.get("profile"):
+            profile = options.pop("profile")
+            client  = Cli.profile_client(config, profile)
+
+            with client.activate():
+                return Cli.instrument(Config.profile(config, profile),
+                        options, argv)
+        #end if
+
+        return Cli.instrument(config, options, argv)
+    #end function
+
+    @staticmethod
+    def instrument(config, options, argv):
+        if not options:
+            return Cli.dispatch(config, argv)
+
+        from .instrument import Stats, Trace
+
+        stats = Stats() if options.get("stats") else None
+        trace = None
+
+        if options.get("trace"):
+            try:
+                trace = Trace(options["trace"])
+            except OSError as e:
+                raise CliInvocationError("could not open '%s': %s" %
+                        (options["trace"], e.strerror))
+            #end try
+        #end if
+
+        listeners = [l for l in [stats, trace] if l is not None]
+
+        # The listeners only see the requests of this command, not those of
+        # commands running alongside it in 'exec --jobs'.
+        try:
+            with contextlib.ExitStack() as stack:
+                for listener in listeners:
+                    stack.enter_context(tci().listening(listener))
+                return Cli.dispatch(config, argv)
+            #end with
+        finally:
+            if trace:
+                trace.close()
+            if stats:
+                stats.write(sys.stderr)
+        #end try
+    #end function
+
+    @staticmethod
+    def global_options(argv):
+        # Splits the options that go before the command off argv and
+        # returns them as a dict along with the remaining arguments.
+        options = {}
+        argv    = list(argv)
+
+        while argv:
+            if argv[0] == "--stats":
+                options["stats"] = True
+                del argv[0]
+            elif argv[0] == "--trace" and len(argv) > 1:
+                options["trace"] = argv[1]
+                del argv[:2]
+            elif argv[0].startswith("--trace="):
+                options["trace"] = argv[0][len("--trace="):]
+                del argv[0]
+            elif argv[0] == "--profile" and len(argv) > 1:
+                options["profile"] = argv[1]
+                del argv[:2]
+            elif argv[0].startswith("--profile="):
+                options["profile"] = argv[0][len("--profile="):]
+                del argv[0]
+            else:
+                break
+        #end while
+
+        return options, argv
+    #end function
+
+    @staticmethod
+    def dispatch(config, argv):
         try:
-            command = sys.argv[1]
+            command = argv[0]
         except IndexError:
             Cli.usage()
             sys.exit(Cli.EXIT_OK)
         #end function
 
-        if command == "list":
-            return CliList(sys.argv[1:]).execute_command()
-        if command == "create":
-            return CliCreate(sys.argv[1:]).execute_command()
-        if command == "delete":
-            return CliDelete(sys.argv[1:]).execute_command()
-        if command == "move":
-            return CliMove(sys.argv[1:]).execute_command()
+        # Only 'list' reads from the response cache. All other commands get
+        # it in refresh mode, so that the entries their writes make stale
+        # are dropped and the responses they read are stored fresh.
+        if command in ["list", "exec", "daemon"] or tci() is None:
+            cache = contextlib.nullcontext()
         else:
-            Cli.usage()
-            sys.exit(Cli.EXIT_ERR)
+            from .cache import ResponseCache
+
+            cache = tci().caching(ResponseCache(Config.get_cache_folder(),
+                refresh=True, **Config.cache_options(config or {})))
+        #end if
+
+        with cache:
+            if command == "list":
+                return CliList(argv, config).execute_command()
+            if command == "create":
+                return CliCreate(argv).execute_command()
+            if command == "delete":
+                return CliDelete(argv).execute_command()
+            if command == "move":
+                return CliMove(argv).execute_command()
+            if command == "sort":
+                return CliSort(argv).execute_command()
+            if command == "sync":
+                return CliSync(argv).execute_command()
+            if command == "search":
+                return CliSearch(argv).execute_command()
+            if command == "export":
+                return CliExport(argv).execute_command()
+            if command == "exec":
+                return CliExec(argv, config).execute_command()
+            if command == "daemon":
+                return CliDaemon(argv, config).execute_command()
+            if command == "journal":
+                return CliJournal(argv, config).execute_command()
+            else:
+                Cli.usage()
+                sys.exit(Cli.EXIT_ERR)
+        #end with
+    #end function
+
+    @staticmethod
+    def run(config, argv):
+        # Like execute_command, but returns the exit status instead of
+        # raising. Used to run many commands in one process.
+        try:
+            Cli.execute_command(config, argv)
+        except TrelloBaseError as e:
+            sys.stderr.write("trello-cli: %s\n" % str(e))
+            return Cli.EXIT_ERR
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or Cli.EXIT_OK
+            sys.stderr.write("%s\n" % e.code)
+            return Cli.EXIT_ERR
+        except Exception as e:
+            # a broken command must not take the others down with it
+            sys.stderr.write("trello-cli: %s: %s\n" %
+                    (type(e).__name__, str(e)))
+            return Cli.EXIT_ERR
+        #end try
+
+        return Cli.EXIT_OK
     #end function
 
 #end class
 
 class CliList:
 
-    def __init__(self, argv):
-        self._argv    = argv
-        self._options = {}
+    def __init__(self, argv, config=None):
+        self._argv      = argv
+        self._config    = config or {}
+        self._options   = {}
+        self._mirror_db = None
     #end function
 
     @staticmethod
@@ -132,13 +526,25 @@ class CliList:
             "   lists                                                          \n"
             "   cards                                                          \n"
             "   labels                                                         \n"
+            "   tree                                                           \n"
             "                                                                  \n"
             "OPTIONS:                                                          \n"
             "                                                                  \n"
-            " --board-id <id>   When listing lists or labels, a board needs to \n"
-            "                   be specified.                                  \n"
+            " --board-id <id>   When listing lists, labels or the tree of a    \n"
+            "                   board, a board needs to be specified.          \n"
             " --list-id <id>    When listing cards, a list (column) needs to be\n"
             "                   specifed.                                      \n"
+            " --no-cache        Neither read from nor write to the local       \n"
+            "                   response cache.                                \n"
+            " --refresh         Bypass cached responses, but store the fresh   \n"
+            "                   results in the cache.                          \n"
+            " --offline         Read from the local mirror instead of the      \n"
+            "                   server (see 'trello-cli sync').                \n"
+            " --format <f>      One of table (the default), json, ndjson, csv  \n"
+            "                   or tsv. Except for tables, boards, lists,      \n"
+            "                   cards and labels are written as they arrive    \n"
+            "                   from the server.                               \n"
+            " --fields <f,..>   Comma separated list of the fields to show.    \n"
             "                                                                  \n"
         )
     #end function
@@ -151,83 +557,222 @@ class CliList:
 
         self._parse_opts()
 
-        if type_ == "boards":
-            self.list_boards()
-        elif type_ == "lists":
-            self.list_lists()
-        elif type_ == "cards":
-            self.list_cards()
-        elif type_ == "labels":
-            self.list_labels()
-        else:
-            CliList.usage()
-            sys.exit(Cli.EXIT_ERR)
+        cache = None
+
+        if not self._options.get("no-cache"):
+            from .cache import ResponseCache
+
+            cache = ResponseCache(Config.get_cache_folder(),
+                refresh=self._options.get("refresh", False),
+                **Config.cache_options(self._config))
+        #end if
+
+        # the cache only applies to this command, even when parallel script
+        # commands share the client
+        with tci().caching(cache):
+            if type_ == "boards":
+                self.list_boards()
+            elif type_ == "lists":
+                self.list_lists()
+            elif type_ == "cards":
+                self.list_cards()
+            elif type_ == "labels":
+                self.list_labels()
+            elif type_ == "tree":
+                self.list_tree()
+            else:
+                CliList.usage()
+                sys.exit(Cli.EXIT_ERR)
+            #end if
+        #end with
     #end function
 
     def list_boards(self):
-        if "board-id" in self._options:
-            boards = [Board.by_id(self._options["board-id"])]
+        fields = self._fields(("id", "name"))
+
+        if self._options.get("offline"):
+            if "board-id" in self._options:
+                boards = [self._from_mirror(self._mirror().board, "board",
+                    "board-id")]
+            else:
+                boards = self._mirror().boards()
+        elif "board-id" in self._options:
+            boards = [Board.by_id(self._options["board-id"], fields=fields)]
+        elif self._streaming():
+            boards = Board.iter_all(fields=fields)
         else:
-            boards = Board.all()
+            boards = Board.all(fields=fields)
         #end if
 
-        for i in range(len(boards)):
-            b = boards[i]
-            print("| %3d | %s | %-40.40s |" % (i, b.id, b.name))
+        self._write(boards, fields)
     #end function
 
     def list_lists(self):
         if not "board-id" in self._options:
             raise CliInvocationError("please specify the board id.")
 
+        fields = self._fields(("id", "name"))
+
         try:
-            board = Board.by_id(self._options["board-id"])
+            if self._options.get("offline"):
+                board = self._from_mirror(self._mirror().board, "board",
+                        "board-id")
+                lists = self._mirror().lists(board.id)
+            elif self._streaming():
+                lists = Board({"id": self._options["board-id"]})\
+                        .iter_lists(fields=fields)
+            else:
+                board = Board.by_id(self._options["board-id"])
+                lists = board.lists(fields=fields)
+            #end if
+
+            self._write(lists, fields)
         except TrelloClientError as e:
             raise CliInvocationError("failed to locate the specified board.")
-
-        lists = board.lists()
-
-        for i in range(len(lists)):
-            l = lists[i]
-            print("| %3d | %s | %-40.40s |" % (i, l.id, l.name))
     #end function
 
     def list_cards(self):
         if not "list-id" in self._options:
             raise CliInvocationError("please specify the list id.")
 
+        fields = self._fields(("id", "name"))
+
         try:
-            list_ = List.by_id(self._options["list-id"])
+            if self._options.get("offline"):
+                list_ = self._from_mirror(self._mirror().list, "list",
+                        "list-id")
+                cards = self._mirror().iter_cards(list_.id)
+            elif self._streaming():
+                cards = List({"id": self._options["list-id"]})\
+                        .iter_cards(fields=fields)
+            else:
+                list_ = List.by_id(self._options["list-id"])
+                cards = list_.cards(fields=fields)
+            #end if
+
+            self._write(cards, fields)
         except TrelloClientError as e:
             raise CliInvocationError("failed to locate the specified list.")
-
-        cards = list_.cards()
-
-        for i in range(len(cards)):
-            c = cards[i]
-            print("| %3d | %s | %-40.40s |" % (i, c.id, c.name))
     #end function
 
     def list_labels(self):
         if not "board-id" in self._options:
             raise CliInvocationError("please specify the board id.")
 
+        fields = self._fields(("id", "name", "color"))
+
         try:
-            board = Board.by_id(self._options["board-id"])
+            if self._options.get("offline"):
+                board  = self._from_mirror(self._mirror().board, "board",
+                        "board-id")
+                labels = self._mirror().labels(board.id)
+            elif self._streaming():
+                labels = Board({"id": self._options["board-id"]})\
+                        .iter_labels(fields=fields)
+            else:
+                board  = Board.by_id(self._options["board-id"])
+                labels = board.labels(fields=fields)
+            #end if
+
+            self._write(labels, fields, widths={"name": 27, "color": 10})
         except TrelloClientError as e:
             raise CliInvocationError("failed to locate the specified board.")
+    #end function
+
+    def list_tree(self):
+        if not "board-id" in self._options:
+            raise CliInvocationError("please specify the board id.")
+
+        if self._options.get("offline"):
+            board = self._from_mirror(self._mirror().snapshot, "board",
+                    "board-id")
+        else:
+            try:
+                board = Board({"id": self._options["board-id"]}).snapshot()
+            except TrelloClientError as e:
+                raise CliInvocationError(
+                        "failed to locate the specified board.")
+        #end if
+
+        if self._streaming():
+            # one row per card, which carries the name of its list
+            def rows():
+                for l in board["lists"]:
+                    for c in l["cards"]:
+                        row = dict(c)
+                        row["list"]   = l.name
+                        row["labels"] = [label.get("name") or
+                                label.get("color") or label["id"]
+                                    for label in c["labels"]]
+                        yield row
+                    #end for
+                #end for
+            #end function
+
+            self._write(rows(), self._fields(("list", "id", "name",
+                "labels")))
+            return
+        #end if
+
+        print("%s %s" % (board.id, board.name))
+
+        for l in board["lists"]:
+            print("    %s %s" % (l.id, l.name))
+
+            for c in l["cards"]:
+                labels = ", ".join([label.get("name") or label.get("color")
+                    or label["id"] for label in c["labels"]])
+                print("        %s %s%s" % (c.id, c.name,
+                    " [%s]" % labels if labels else ""))
+            #end for
+        #end for
+    #end function
+
+    def _fields(self, default):
+        return self._options.get("fields", default)
+
+    def _streaming(self):
+        # Machine readable output is written while the response streams in.
+        # The table keeps using listings, which go through the cache.
+        return self._options.get("format", "table") != "table"
+    #end function
+
+    def _write(self, objects, fields, widths=None):
+        from .output import create_writer
+
+        writer = create_writer(self._options.get("format", "table"),
+                sys.stdout, fields, widths)
+
+        for obj in objects:
+            writer.write(obj)
+
+        writer.close()
+    #end function
+
+    def _mirror(self):
+        from .mirror import Mirror
+
+        if self._mirror_db is None:
+            self._mirror_db = Mirror(Config.get_mirror_file())
+        return self._mirror_db
+    #end function
+
+    def _from_mirror(self, getter, what, option):
+        obj = getter(self._options[option])
 
-        labels = board.labels()
+        if obj is None:
+            raise CliInvocationError("the specified %s is not in the local "
+                "mirror, run 'trello-cli sync' first." % what)
+        #end if
 
-        for i in range(len(labels)):
-            l = labels[i]
-            print("| %3d | %s | %-27.27s | %-10.10s |" % (i, l.id, l.name, l.color))
+        return obj
     #end function
 
     def _parse_opts(self):
         try:
             opts, args = getopt.getopt(self._argv[2:], "h",
-                    ["help", "board-id=", "list-id="])
+                    ["help", "board-id=", "list-id=", "no-cache", "refresh",
+                        "offline", "format=", "fields="])
         except getopt.GetoptError as e:
             CliList.usage()
             sys.exit(Cli.EXIT_ERR)
@@ -241,6 +786,22 @@ class CliList:
                 self._options["board-id"] = v.strip()
             elif o == "--list-id":
                 self._options["list-id"] = v.strip()
+            elif o == "--no-cache":
+                self._options["no-cache"] = True
+            elif o == "--refresh":
+                self._options["refresh"] = True
+            elif o == "--offline":
+                self._options["offline"] = True
+            elif o == "--format":
+                from .output import FORMATS
+
+                if not v.strip() in FORMATS:
+                    raise CliInvocationError("unknown output format '%s'." %
+                            v.strip())
+                self._options["format"] = v.strip()
+            elif o == "--fields":
+                self._options["fields"] = tuple(f.strip() for f in
+                        v.split(",") if f.strip())
         #end for
     #end function
 
@@ -263,6 +824,7 @@ class CliCreate:
             "TYPES:                                                            \n"
             "                                                                  \n"
             "   card                                                           \n"
+            "   cards                                                          \n"
             "                                                                  \n"
             "OPTIONS:                                                          \n"
             "                                                                  \n"
@@ -285,11 +847,20 @@ class CliCreate:
             "                                                                  \n"
             " --list-id <id>    When creating cards, a list (column) needs to  \n"
             "                   be specifed.                                   \n"
-            " --labels <id..>   Comma separate list of label IDs to tag a      \n"
-            "                   card with.                                     \n"
+            " --board-id <id>   The board of the list. Saves a request when    \n"
+            "                   --labels are given.                            \n"
+            " --labels <id..>   Comma separate list of label IDs or names to   \n"
+            "                   tag a card with.                               \n"
             " --comment <text>  An initial comment to attache to the card.     \n"
             " --due <date>      An optional due date.                          \n"
             "                                                                  \n"
+            " --from-file <f>   When creating cards in bulk, a JSONL or CSV    \n"
+            "                   file (or - for JSONL on stdin) with one card   \n"
+            "                   per row. The fields are name, desc, labels     \n"
+            "                   (IDs or names), due and comment. The cards are \n"
+            "                   appended to the list in file order.            \n"
+            " --jobs <n>        How many cards to create concurrently (4).     \n"
+            "                                                                  \n"
         )
     #end function
 
@@ -303,6 +874,8 @@ class CliCreate:
 
         if type_ == "card":
             self.create_card()
+        elif type_ == "cards":
+            self.create_cards()
         else:
             CliCreate.usage()
             sys.exit(Cli.EXIT_ERR)
@@ -312,24 +885,9 @@ class CliCreate:
         if not "list-id" in self._options:
             raise CliInvocationError("please specify a list id.")
 
-        try:
-            list_ = List.by_id(self._options["list-id"])
-        except TrelloClientError as e:
-            raise CliInvocationError("failed to locate the specified list.")
-
+        list_  = List({"id": self._options["list-id"]})
         labels = self._options.get("labels", [])
-
-        for l in labels:
-            try:
-                Label.by_id(l)
-            except TrelloClientError as e:
-                raise CliInvocationError(
-                    "unable to locate or no such label: '%s'" % l)
-        #end for
-
-        card = Card()
-
-        pos = self._options.get("position", len(list_.cards()))
+        card   = Card()
 
         if ("name" in self._options) and self._options["name"]:
             card.name = self._options["name"]
@@ -338,20 +896,207 @@ class CliCreate:
         if ("due" in self._options) and self._options["due"]:
             card.due = self._options["due"]
 
-        card.idLabels = labels
+        card.idLabels = []
+
+        # the list only needs to be looked up to find its board's labels,
+        # otherwise creating the card tells whether the list exists
+        if labels:
+            board_labels = board_label_ids(list_,
+                    self._options.get("board-id"))
 
-        list_.insert(pos, card)
+            for l in labels:
+                if not l in board_labels:
+                    raise CliInvocationError(
+                        "unable to locate or no such label: '%s'" % l)
+                if not board_labels[l] in card.idLabels:
+                    card.idLabels.append(board_labels[l])
+            #end for
+        #end if
+
+        try:
+            if "position" in self._options:
+                list_.insert(self._options["position"], card)
+            else:
+                list_.create_card(card)
+        except TrelloClientError as e:
+            raise CliInvocationError("failed to create the card in the "
+                    "specified list.")
+        #end try
 
         comment = self._options.get("comment")
-        if comment:
+
+        # without an id, the card is waiting in the journal
+        if not "id" in card:
+            sys.stderr.write("trello-cli: the card was queued in the "
+                    "journal%s.\n" % (", its comment was dropped" if comment
+                        else ""))
+        elif comment:
             card.add_comment(comment)
     #end function
 
+    def create_cards(self):
+        if not "list-id" in self._options:
+            raise CliInvocationError("please specify a list id.")
+        if not "from-file" in self._options:
+            raise CliInvocationError("please specify an input file.")
+
+        rows = self._read_rows(self._options["from-file"])
+
+        list_ = List({"id": self._options["list-id"]})
+
+        # validate all labels against a single fetch of the board's labels
+        board_labels = board_label_ids(list_, self._options.get("board-id"))
+
+        # fixed positions keep the file order despite concurrent creation
+        jobs = list(zip(rows, list_.next_positions(len(rows))))
+
+        def create(job):
+            (lineno, row), pos = job
+
+            card = self._card_from_row(row, board_labels)
+            list_.create_card(card, pos)
+
+            # the card exists at this point, a failing comment is reported
+            # with the row but does not fail it
+            comment_error = None
+
+            # without an id, the card is waiting in the journal
+            if not "id" in card:
+                return card, comment_error
+
+            if row.get("comment"):
+                try:
+                    card.add_comment(row["comment"])
+                except TrelloBaseError as e:
+                    comment_error = e
+            #end if
+
+            return card, comment_error
+        #end function
+
+        def progress(done, total):
+            sys.stderr.write("\rcreated %d/%d cards" % (done, total))
+            sys.stderr.flush()
+        #end function
+
+        results = run_parallel(create, jobs,
+                jobs=self._options.get("jobs", 4), progress=progress)
+
+        if results:
+            sys.stderr.write("\n")
+
+        failed = 0
+
+        for ((lineno, row), pos), result, error in results:
+            if error is None:
+                card, comment_error = result
+
+                if not "id" in card:
+                    print("| %5d | %-24s | %-40.40s |" % (lineno, "queued",
+                        card.name))
+                    if row.get("comment"):
+                        sys.stderr.write("trello-cli: row %d: the card was "
+                            "queued in the journal, its comment was "
+                                "dropped.\n" % lineno)
+                    continue
+                #end if
+
+                print("| %5d | %s | %-40.40s |" % (lineno, card.id, card.name))
+
+                if comment_error is not None:
+                    sys.stderr.write("trello-cli: row %d: the card was "
+                            "created, but its comment failed: %s\n" %
+                                (lineno, str(comment_error)))
+                #end if
+            else:
+                failed += 1
+                sys.stderr.write("trello-cli: row %d: %s\n" %
+                        (lineno, str(error)))
+            #end if
+        #end for
+
+        if failed:
+            raise CliInvocationError("%d of %d cards could not be created." %
+                    (failed, len(results)))
+    #end function
+
+    def _read_rows(self, filename):
+        # returns a list of (line number, row) tuples
+        try:
+            if filename == "-":
+                lines = sys.stdin.read().splitlines()
+            else:
+                with open(filename, "r", encoding="utf-8", newline="") as fp:
+                    lines = fp.read().splitlines()
+        except OSError as e:
+            raise CliInvocationError("could not read '%s': %s" %
+                    (filename, e.strerror))
+        #end try
+
+        if filename.lower().endswith(".csv"):
+            import csv
+
+            reader = csv.DictReader(lines)
+            return [(reader.line_num, row) for row in reader]
+
+        rows = []
+
+        for lineno, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise CliInvocationError("invalid JSON on line %d." % lineno)
+            if not isinstance(row, dict):
+                raise CliInvocationError("expected an object on line %d." %
+                        lineno)
+            rows.append((lineno, row))
+        #end for
+
+        return rows
+    #end function
+
+    def _card_from_row(self, row, board_labels):
+        if not row.get("name"):
+            raise ValueError("a card needs a name.")
+
+        labels = row.get("labels") or []
+        if isinstance(labels, str):
+            labels = list(filter(bool, [l.strip() for l in labels.split(",")]))
+        if not isinstance(labels, list) or not all(isinstance(l, str)
+                for l in labels):
+            raise ValueError("labels must be a string or a list of strings.")
+
+        card = Card()
+
+        card.name = str(row["name"])
+        if row.get("desc"):
+            card.desc = str(row["desc"])
+        if row.get("due"):
+            try:
+                card.due = str(dateparse(str(row["due"])).date())
+            except (ValueError, OverflowError):
+                raise ValueError("could not parse due date.")
+        #end if
+
+        card.idLabels = []
+
+        for l in labels:
+            if not l in board_labels:
+                raise ValueError("no such label on the board: '%s'" % l)
+            card.idLabels.append(board_labels[l])
+        #end for
+
+        return card
+    #end function
+
     def _parse_opts(self):
         try:
             opts, args = getopt.getopt(self._argv[2:], "h",
                     ["help", "name=", "desc=", "position=", "list-id=",
-                        "labels=", "comment=", "due="])
+                        "board-id=", "labels=", "comment=", "due=",
+                        "from-file=", "jobs="])
         except getopt.GetoptError as e:
             CliCreate.usage()
             sys.exit(Cli.EXIT_ERR)
@@ -376,6 +1121,8 @@ class CliCreate:
                 self._options["position"] = v
             elif o == "--list-id":
                 self._options["list-id"] = v.strip()
+            elif o == "--board-id":
+                self._options["board-id"] = v.strip()
             elif o == "--labels":
                 self._options["labels"] = list(
                         filter(bool, v.strip().split(",")))
@@ -387,6 +1134,15 @@ class CliCreate:
                 except ValueError:
                     raise CliInvocationError("could not parse due date.")
                 self._options["due"] = str(due_date.date())
+            elif o == "--from-file":
+                self._options["from-file"] = v.strip()
+            elif o == "--jobs":
+                try:
+                    self._options["jobs"] = max(1, int(v.strip()))
+                except ValueError:
+                    raise CliInvocationError(
+                            "expected an integer argument for --jobs.")
+                #end try
             #end if
         #end for
     #end function
@@ -410,10 +1166,22 @@ class CliDelete:
             "TYPES:                                                            \n"
             "                                                                  \n"
             "   card                                                           \n"
+            "   cards                                                          \n"
             "                                                                  \n"
             "OPTIONS:                                                          \n"
             "                                                                  \n"
             " --card-id <id>    Specify the card to delete.                    \n"
+            " --archive         Archive instead of deleting permanently.       \n"
+            "                                                                  \n"
+            " --from-list <id>  When deleting cards in bulk, the list to delete\n"
+            "                   them from.                                     \n"
+            " --label <label>   Only cards with this label (ID or name).       \n"
+            " --due-before <d>  Only cards due before this date.               \n"
+            " --jobs <n>        Number of cards to delete concurrently (4).    \n"
+            " --dry-run         Only show which cards would be deleted.        \n"
+            " --report <file>   Write the cards that failed to file.           \n"
+            " --resume <file>   Retry the cards in a report instead of         \n"
+            "                   selecting cards from a list.                   \n"
             "                                                                  \n"
         )
     #end function
@@ -428,6 +1196,8 @@ class CliDelete:
 
         if type_ == "card":
             self.delete_card()
+        elif type_ == "cards":
+            self.delete_cards()
         else:
             CliDelete.usage()
             sys.exit(Cli.EXIT_ERR)
@@ -437,16 +1207,33 @@ class CliDelete:
         if not "card-id" in self._options:
             raise CliInvocationError("please specify a card id.")
 
+        card = Card(data={"id": self._options["card-id"]})
+
         try:
-            Card(data={"id": self._options["card-id"]}).delete()
+            if self._options.get("archive"):
+                card.archive()
+            else:
+                card.delete()
         except TrelloClientError as e:
             raise CliInvocationError("failed to delete the specified card.")
     #end function
 
+    def delete_cards(self):
+        cards = select_cards(self._options)
+
+        if self._options.get("archive"):
+            apply_to_cards(cards, lambda card: card.archive(), self._options,
+                    "archived")
+        else:
+            apply_to_cards(cards, lambda card: card.delete(), self._options,
+                    "deleted")
+        #end if
+    #end function
+
     def _parse_opts(self):
         try:
             opts, args = getopt.getopt(self._argv[2:], "h",
-                    ["help", "card-id="])
+                    ["help", "card-id=", "archive"] + BULK_OPTIONS)
         except getopt.GetoptError as e:
             CliDelete.usage()
             sys.exit(Cli.EXIT_ERR)
@@ -458,6 +1245,10 @@ class CliDelete:
                 sys.exit(Cli.EXIT_OK)
             elif o == "--card-id":
                 self._options["card-id"] = v.strip()
+            elif o == "--archive":
+                self._options["archive"] = True
+            else:
+                parse_bulk_option(self._options, o, v)
             #end if
         #end for
     #end function
@@ -481,11 +1272,24 @@ class CliMove:
             "TYPES:                                                            \n"
             "                                                                  \n"
             "   card                                                           \n"
+            "   cards                                                          \n"
             "                                                                  \n"
             "OPTIONS:                                                          \n"
             "                                                                  \n"
+            " --card-id <id>    Specify the card to move.                      \n"
             " --list-id <id>    Specify the id of the list to move the card to.\n"
             "                                                                  \n"
+            " --from-list <id>  When moving cards in bulk, the list to move    \n"
+            "                   them from.                                     \n"
+            " --to-list <id>    The list to move the cards to.                 \n"
+            " --label <label>   Only cards with this label (ID or name).       \n"
+            " --due-before <d>  Only cards due before this date.               \n"
+            " --jobs <n>        Number of cards to move concurrently (4).      \n"
+            " --dry-run         Only show which cards would be moved.          \n"
+            " --report <file>   Write the cards that failed to file.           \n"
+            " --resume <file>   Retry the cards in a report instead of         \n"
+            "                   selecting cards from a list.                   \n"
+            "                                                                  \n"
         )
     #end function
 
@@ -499,6 +1303,8 @@ class CliMove:
 
         if type_ == "card":
             self.move_card()
+        elif type_ == "cards":
+            self.move_cards()
         else:
             CliMove.usage()
             sys.exit(Cli.EXIT_ERR)
@@ -515,26 +1321,807 @@ class CliMove:
             raise CliInvocationError("failed to move the card.")
     #end function
 
+    def move_cards(self):
+        if not "to-list" in self._options:
+            raise CliInvocationError("please specify a list to move to.")
+
+        to_list = self._options["to-list"]
+        cards   = select_cards(self._options)
+
+        apply_to_cards(cards, lambda card: card.move_to(to_list),
+                self._options, "moved")
+    #end function
+
     def _parse_opts(self):
         try:
             opts, args = getopt.getopt(self._argv[2:], "h",
-                    ["help", "card-id=", "list-id="])
+                    ["help", "card-id=", "list-id=", "to-list="] +
+                        BULK_OPTIONS)
         except getopt.GetoptError as e:
-            CliDelete.usage()
+            CliMove.usage()
             sys.exit(Cli.EXIT_ERR)
         #end try
 
         for o, v in opts:
             if o == "--help":
-                CliDelete.usage()
+                CliMove.usage()
                 sys.exit(Cli.EXIT_OK)
             elif o == "--card-id":
                 self._options["card-id"] = v.strip()
             elif o == "--list-id":
                 self._options["list-id"] = v.strip()
+            elif o == "--to-list":
+                self._options["to-list"] = v.strip()
+            else:
+                parse_bulk_option(self._options, o, v)
             #end if
         #end for
     #end function
 
 #end class
 
+class CliSort:
+
+    # sort keys, cards without a due date or labels go last
+    KEYS = {
+        "due":   (("due",),    lambda card: (card.get("due") is None,
+                    card.get("due") or "")),
+        "name":  (("name",),   lambda card: card.get("name", "").casefold()),
+        "label": (("labels",), lambda card: (not card.get("labels"),
+                    sorted(label.get("name", "").casefold()
+                        for label in card.get("labels", []))))
+    }
+
+    def __init__(self, argv):
+        self._argv    = argv
+        self._options = {}
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli sort list [OPTIONS]                             \n"
+            "                                                                  \n"
+            "Sort the cards of a list. Only the cards that are out of order    \n"
+            "get a new position, cards that compare equal keep their order.    \n"
+            "                                                                  \n"
+            "OPTIONS:                                                          \n"
+            "                                                                  \n"
+            " --list-id <id>    Specify the list to sort.                      \n"
+            " --by <key>        Sort by 'due', 'name' or 'label' (name).       \n"
+            " --jobs <n>        Number of cards to move concurrently (4).      \n"
+            " --dry-run         Only show which cards would be moved where.    \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        try:
+            type_ = self._argv[1]
+        except IndexError:
+            type_ = None
+
+        self._parse_opts()
+
+        if type_ == "list":
+            self.sort_list()
+        else:
+            CliSort.usage()
+            sys.exit(Cli.EXIT_ERR)
+    #end function
+
+    def sort_list(self):
+        if not "list-id" in self._options:
+            raise CliInvocationError("please specify a list id.")
+
+        fields, key = CliSort.KEYS[self._options.get("by", "name")]
+
+        try:
+            plan = List({"id": self._options["list-id"]}).sort_plan(key,
+                    fields=("id", "name") + fields)
+        except TrelloClientError as e:
+            raise CliInvocationError("failed to locate the specified list.")
+
+        if self._options.get("dry-run"):
+            for card, pos in plan:
+                print("| %s | %-40.40s | %14.4f |" % (card.id,
+                    card.get("name", ""), pos))
+            return
+        #end if
+
+        positions = dict((card.id, pos) for card, pos in plan)
+
+        apply_to_cards([card for card, pos in plan],
+                lambda card: card.set_position(positions[card.id]),
+                    self._options, "moved")
+    #end function
+
+    def _parse_opts(self):
+        try:
+            opts, args = getopt.getopt(self._argv[2:], "h",
+                    ["help", "list-id=", "by=", "jobs=", "dry-run"])
+        except getopt.GetoptError as e:
+            CliSort.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end try
+
+        for o, v in opts:
+            if o == "--help":
+                CliSort.usage()
+                sys.exit(Cli.EXIT_OK)
+            elif o == "--list-id":
+                self._options["list-id"] = v.strip()
+            elif o == "--by":
+                if not v.strip() in CliSort.KEYS:
+                    raise CliInvocationError("cannot sort by '%s'." % v)
+                self._options["by"] = v.strip()
+            else:
+                parse_bulk_option(self._options, o, v)
+            #end if
+        #end for
+    #end function
+
+#end class
+
+class CliSync:
+
+    def __init__(self, argv):
+        self._argv    = argv
+        self._options = {}
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli sync [OPTIONS]                                  \n"
+            "                                                                  \n"
+            "Mirror boards into a local database at ~/.trello-cli/mirror.sqlite\n"
+            "The first sync of a board takes a full snapshot, later ones only  \n"
+            "fetch the actions since the previous sync.                        \n"
+            "                                                                  \n"
+            "OPTIONS:                                                          \n"
+            "                                                                  \n"
+            " --board-id <id>   The board to mirror. May be given repeatedly.  \n"
+            "                   Without it, all boards already in the mirror   \n"
+            "                   are updated.                                   \n"
+            " --all-boards      Mirror all open boards of the user.            \n"
+            " --full            Take a full snapshot even if an incremental    \n"
+            "                   sync would be possible.                        \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        self._parse_opts()
+        self.sync()
+    #end function
+
+    def sync(self):
+        from .mirror import Mirror
+
+        mirror = Mirror(Config.get_mirror_file())
+
+        try:
+            if self._options.get("all-boards"):
+                board_ids = [b.id for b in Board.all()]
+            elif self._options.get("board-ids"):
+                board_ids = self._options["board-ids"]
+            else:
+                board_ids = [b.id for b in mirror.boards()]
+            #end if
+
+            if not board_ids:
+                raise CliInvocationError("please specify a board id.")
+
+            for board_id in board_ids:
+                try:
+                    count = mirror.sync(board_id,
+                            full=self._options.get("full", False))
+                except TrelloClientError as e:
+                    raise CliInvocationError(
+                            "failed to sync board '%s'." % board_id)
+                #end try
+
+                if count is None:
+                    print("| %s | full snapshot              |" % board_id)
+                else:
+                    print("| %s | %6d actions applied     |" %
+                            (board_id, count))
+            #end for
+        finally:
+            mirror.close()
+        #end try
+    #end function
+
+    def _parse_opts(self):
+        try:
+            opts, args = getopt.getopt(self._argv[1:], "h",
+                    ["help", "board-id=", "all-boards", "full"])
+        except getopt.GetoptError as e:
+            CliSync.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end try
+
+        for o, v in opts:
+            if o == "--help":
+                CliSync.usage()
+                sys.exit(Cli.EXIT_OK)
+            elif o == "--board-id":
+                self._options.setdefault("board-ids", []).append(v.strip())
+            elif o == "--all-boards":
+                self._options["all-boards"] = True
+            elif o == "--full":
+                self._options["full"] = True
+            #end if
+        #end for
+    #end function
+
+#end class
+
+class CliSearch:
+
+    def __init__(self, argv):
+        self._argv    = argv
+        self._options = {}
+        self._query   = ""
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli search [OPTIONS] <query>                        \n"
+            "                                                                  \n"
+            "Search the names, descriptions and comments of all cards in the   \n"
+            "local mirror (see 'trello-cli sync'). Each word of the query      \n"
+            "matches words starting with it. Results are ranked by relevance.  \n"
+            "                                                                  \n"
+            "OPTIONS:                                                          \n"
+            "                                                                  \n"
+            " --board-id <id>   Only search cards on the given board.          \n"
+            " --list-id <id>    Only search cards in the given list.           \n"
+            " --label <label>   Only search cards with the given label (id or  \n"
+            "                   name).                                         \n"
+            " --limit <n>       Show at most this many results (20).           \n"
+            " --sync            Update the mirror before searching.            \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        self._parse_opts()
+
+        if not self._query.strip():
+            CliSearch.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end if
+
+        self.search()
+    #end function
+
+    def search(self):
+        from .mirror import Mirror
+
+        mirror = Mirror(Config.get_mirror_file())
+
+        try:
+            if self._options.get("sync"):
+                if "board-id" in self._options:
+                    board_ids = [self._options["board-id"]]
+                else:
+                    board_ids = [b.id for b in mirror.boards()]
+
+                for board_id in board_ids:
+                    mirror.sync(board_id)
+            #end if
+
+            cards = mirror.search(self._query,
+                    board_id=self._options.get("board-id"),
+                    list_id=self._options.get("list-id"),
+                    label=self._options.get("label"),
+                    limit=self._options.get("limit", 20))
+        finally:
+            mirror.close()
+        #end try
+
+        for i in range(len(cards)):
+            c = cards[i]
+            print("| %3d | %s | %-40.40s |" % (i, c.id, c.name))
+    #end function
+
+    def _parse_opts(self):
+        try:
+            opts, args = getopt.gnu_getopt(self._argv[1:], "h",
+                    ["help", "board-id=", "list-id=", "label=", "limit=",
+                        "sync"])
+        except getopt.GetoptError as e:
+            CliSearch.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end try
+
+        self._query = " ".join(args)
+
+        for o, v in opts:
+            if o == "--help":
+                CliSearch.usage()
+                sys.exit(Cli.EXIT_OK)
+            elif o == "--board-id":
+                self._options["board-id"] = v.strip()
+            elif o == "--list-id":
+                self._options["list-id"] = v.strip()
+            elif o == "--label":
+                self._options["label"] = v.strip()
+            elif o == "--limit":
+                try:
+                    self._options["limit"] = max(1, int(v.strip()))
+                except ValueError:
+                    raise CliInvocationError(
+                            "expected an integer argument for --limit.")
+                #end try
+            elif o == "--sync":
+                self._options["sync"] = True
+            #end if
+        #end for
+    #end function
+
+#end class
+
+class CliExport:
+
+    def __init__(self, argv):
+        self._argv    = argv
+        self._options = {}
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli export [OPTIONS]                                \n"
+            "                                                                  \n"
+            "Write boards with their labels, lists, cards and comments to a    \n"
+            "JSON lines file, compressed if it ends in .gz or .zst. A manifest \n"
+            "with counts and checksums is written next to it.                  \n"
+            "                                                                  \n"
+            "OPTIONS:                                                          \n"
+            "                                                                  \n"
+            " --all-boards      Export all boards, including closed ones.      \n"
+            " --board-id <id>   Export this board, may be given repeatedly.    \n"
+            " --out <file>      The file to write, e.g. backup.jsonl.gz.       \n"
+            " --jobs <n>        Number of boards to export concurrently (4).   \n"
+            " --resume          Continue an export that was interrupted.       \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        from .export import Exporter
+
+        self._parse_opts()
+
+        if not "out" in self._options:
+            raise CliInvocationError("please specify an output file.")
+
+        if self._options.get("all-boards"):
+            boards = Board.all(filter="all", fields=None)
+        elif self._options.get("board-id"):
+            with tci().batch():
+                boards = [Board.by_id(board_id)
+                        for board_id in self._options["board-id"]]
+            #end with
+        else:
+            raise CliInvocationError("please specify --all-boards or a board.")
+        #end if
+
+        def progress(count, total):
+            sys.stderr.write("\rexported %d/%d boards" % (count, total))
+            sys.stderr.flush()
+        #end function
+
+        try:
+            exporter = Exporter(self._options["out"],
+                    jobs=self._options.get("jobs", 4), progress=progress)
+            manifest, failed = exporter.run(boards,
+                    resume=self._options.get("resume", False))
+        except ImportError as e:
+            raise CliInvocationError("writing .zst files requires the "
+                    "zstandard package.")
+        except OSError as e:
+            raise CliInvocationError("could not write '%s': %s" %
+                    (self._options["out"], e.strerror))
+        #end try
+
+        sys.stderr.write("\n")
+
+        for board, error in failed:
+            sys.stderr.write("trello-cli: board %s: %s\n" %
+                    (board.id, str(error)))
+        #end for
+
+        if failed:
+            raise CliInvocationError("%d of %d boards could not be "
+                    "exported, run again with --resume." %
+                        (len(failed), len(boards)))
+        #end if
+
+        print(", ".join("%d %ss" % (count, type_)
+            for type_, count in manifest["counts"].items()))
+    #end function
+
+    def _parse_opts(self):
+        try:
+            opts, args = getopt.getopt(self._argv[1:], "h",
+                    ["help", "all-boards", "board-id=", "out=", "jobs=",
+                        "resume"])
+        except getopt.GetoptError as e:
+            CliExport.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end try
+
+        for o, v in opts:
+            if o == "--help":
+                CliExport.usage()
+                sys.exit(Cli.EXIT_OK)
+            elif o == "--all-boards":
+                self._options["all-boards"] = True
+            elif o == "--board-id":
+                self._options.setdefault("board-id", []).append(v.strip())
+            elif o == "--out":
+                self._options["out"] = v
+            elif o == "--resume":
+                self._options["resume"] = True
+            else:
+                parse_bulk_option(self._options, o, v)
+            #end if
+        #end for
+    #end function
+
+#end class
+
+class CliExec:
+
+    def __init__(self, argv, config=None):
+        self._argv    = argv
+        self._config  = config or {}
+        self._options = {}
+        self._script  = None
+        self._stop    = None
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli exec [OPTIONS] <script>                         \n"
+            "                                                                  \n"
+            "Run the commands in a script, one per line, in a single process.  \n"
+            "Say - to read the script from stdin. Each line is a trello-cli    \n"
+            "command line, optionally starting with 'trello-cli'. Blank lines  \n"
+            "and comments starting with # are ignored.                         \n"
+            "                                                                  \n"
+            "The status of each line is reported on stderr.                    \n"
+            "                                                                  \n"
+            "OPTIONS:                                                          \n"
+            "                                                                  \n"
+            " --jobs <n>        Run up to n commands in parallel. Commands that\n"
+            "                   refer to the same ids still run in script      \n"
+            "                   order. Output is shown when all are done.      \n"
+            "                   Default is 1.                                  \n"
+            " --stop-on-error   Skip all remaining commands after the first    \n"
+            "                   failure.                                       \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        from .script import parse_script, chains, ThreadOutput
+
+        self._parse_opts()
+
+        if not self._script:
+            raise CliInvocationError("please specify a script.")
+
+        commands   = parse_script(self._read_lines())
+        jobs       = self._options.get("jobs", 1)
+        self._stop = threading.Event()
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout     = ThreadOutput(stdout)
+        sys.stderr     = ThreadOutput(stderr)
+
+        try:
+            if jobs == 1:
+                results = self._run_chain(commands, report=self._report)
+            else:
+                results = []
+
+                for chain, result, error in run_parallel(self._run_chain,
+                        chains(commands), jobs=jobs):
+                    results.extend(result)
+                #end for
+
+                results.sort(key=lambda result: result[0])
+
+                for result in results:
+                    self._report(*result)
+            #end if
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+        #end try
+
+        failed = len([r for r in results if r[2] not in [None, Cli.EXIT_OK]])
+
+        if failed:
+            raise CliInvocationError("%d of %d commands failed." %
+                    (failed, len(results)))
+        #end if
+    #end function
+
+    def _run_chain(self, chain, report=None):
+        import io
+
+        results = []
+
+        for lineno, argv in chain:
+            if self._stop.is_set():
+                result = (lineno, argv, None, "", "")
+            else:
+                stdout = io.StringIO()
+                stderr = io.StringIO()
+
+                sys.stdout.capture(stdout)
+                sys.stderr.capture(stderr)
+                try:
+                    status = Cli.run(self._config, argv)
+                finally:
+                    sys.stdout.release()
+                    sys.stderr.release()
+                #end try
+
+                if status != Cli.EXIT_OK and \
+                        self._options.get("stop-on-error"):
+                    self._stop.set()
+                #end if
+
+                result = (lineno, argv, status, stdout.getvalue(),
+                        stderr.getvalue())
+            #end if
+
+            if report:
+                report(*result)
+            results.append(result)
+        #end for
+
+        return results
+    #end function
+
+    def _report(self, lineno, argv, status, output, errors):
+        import shlex
+
+        if status is None:
+            state = "skipped"
+        elif status == Cli.EXIT_OK:
+            state = "ok"
+        else:
+            state = "failed"
+        #end if
+
+        sys.stdout.write(output)
+        sys.stdout.flush()
+        sys.stderr.write(errors)
+        sys.stderr.write("| %5d | %-7s | %-40.40s |\n" %
+                (lineno, state, " ".join(shlex.quote(a) for a in argv)))
+        sys.stderr.flush()
+    #end function
+
+    def _read_lines(self):
+        if self._script == "-":
+            return sys.stdin.read().splitlines()
+
+        try:
+            with open(self._script, "r", encoding="utf-8") as fp:
+                return fp.read().splitlines()
+        except OSError as e:
+            raise CliInvocationError("could not read '%s': %s" %
+                    (self._script, e.strerror))
+        #end try
+    #end function
+
+    def _parse_opts(self):
+        try:
+            opts, args = getopt.gnu_getopt(self._argv[1:], "h",
+                    ["help", "jobs=", "stop-on-error"])
+        except getopt.GetoptError as e:
+            CliExec.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end try
+
+        if args:
+            self._script = args[0]
+
+        for o, v in opts:
+            if o == "--help":
+                CliExec.usage()
+                sys.exit(Cli.EXIT_OK)
+            elif o == "--jobs":
+                try:
+                    self._options["jobs"] = max(1, int(v.strip()))
+                except ValueError:
+                    raise CliInvocationError(
+                            "expected an integer argument for --jobs.")
+                #end try
+            elif o == "--stop-on-error":
+                self._options["stop-on-error"] = True
+            #end if
+        #end for
+    #end function
+
+#end class
+
+class CliDaemon:
+
+    def __init__(self, argv, config=None):
+        self._argv    = argv
+        self._config  = config or {}
+        self._options = {}
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli daemon [OPTIONS]                                \n"
+            "                                                                  \n"
+            "Keep a warm API client, connection pool and response cache in a   \n"
+            "background process listening on ~/.trello-cli/daemon.sock. While  \n"
+            "it runs, all other trello-cli commands are forwarded to it.       \n"
+            "Restart the daemon after changing the configuration.              \n"
+            "                                                                  \n"
+            "OPTIONS:                                                          \n"
+            "                                                                  \n"
+            " --detach          Run in the background.                         \n"
+            " --stop            Stop a running daemon.                         \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        from .daemon import Daemon
+
+        self._parse_opts()
+
+        socket_file = Config.get_daemon_socket()
+
+        if self._options.get("stop"):
+            if not Daemon.stop(socket_file):
+                raise CliInvocationError("no daemon is running.")
+        else:
+            Daemon(socket_file, self._config).serve(
+                    detach=self._options.get("detach", False))
+        #end if
+    #end function
+
+    def _parse_opts(self):
+        try:
+            opts, args = getopt.getopt(self._argv[1:], "h",
+                    ["help", "detach", "stop"])
+        except getopt.GetoptError as e:
+            CliDaemon.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end try
+
+        for o, v in opts:
+            if o == "--help":
+                CliDaemon.usage()
+                sys.exit(Cli.EXIT_OK)
+            elif o == "--detach":
+                self._options["detach"] = True
+            elif o == "--stop":
+                self._options["stop"] = True
+            #end if
+        #end for
+    #end function
+
+#end class
+
+class CliJournal:
+
+    def __init__(self, argv, config=None):
+        self._argv    = argv
+        self._config  = config or {}
+    #end function
+
+    @staticmethod
+    def usage():
+        Cli.copyright()
+
+        sys.stdout.write(
+            "Usage: trello-cli journal <show|replay|clear>                     \n"
+            "                                                                  \n"
+            "With \"journal\": true in the configuration, moves, deletions,      \n"
+            "comments and new cards that cannot reach the API are recorded in  \n"
+            "~/.trello-cli/journal.jsonl and sent before the next write.       \n"
+            "Redundant operations are dropped before they are sent.            \n"
+            "                                                                  \n"
+            "COMMANDS:                                                         \n"
+            "                                                                  \n"
+            " show              List the operations waiting in the journal and \n"
+            "                   those the API rejected during a replay.        \n"
+            " replay            Send the waiting operations now.               \n"
+            " clear             Discard the waiting and rejected operations.   \n"
+            "                                                                  \n"
+        )
+    #end function
+
+    def execute_command(self):
+        from .journal import Journal, coalesce
+
+        try:
+            action = self._argv[1]
+        except IndexError:
+            action = None
+
+        if action in ["-h", "--help"]:
+            CliJournal.usage()
+            sys.exit(Cli.EXIT_OK)
+        #end if
+
+        journal = tci()._journal or Journal(
+                Config.get_journal_file(self._config.get("profile")))
+
+        if action == "show":
+            for entry in coalesce(journal.entries()):
+                print("| %-7s | %-24s | %-40.40s |" % (entry["op"],
+                    entry.get("card") or entry.get("list"),
+                        CliJournal._describe(entry)))
+            #end for
+
+            for entry in journal.rejected():
+                print("| %-7s | %-24s | %-40.40s |" % (entry["op"],
+                    entry.get("card") or entry.get("list"),
+                        "rejected: " + entry["error"]))
+            #end for
+        elif action == "replay":
+            report = journal.replay(tci())
+
+            for entry, error in report["failed"]:
+                sys.stderr.write("trello-cli: %s %s: %s\n" % (entry["op"],
+                    entry.get("card") or entry.get("list"), str(error)))
+            #end for
+
+            print("sent %d, coalesced %d, failed %d, pending %d" %
+                    (report["sent"], report["coalesced"],
+                        len(report["failed"]), report["pending"]))
+
+            if report["pending"]:
+                raise CliInvocationError("the API is still out of reach.")
+        elif action == "clear":
+            journal.clear()
+        else:
+            CliJournal.usage()
+            sys.exit(Cli.EXIT_ERR)
+        #end if
+    #end function
+
+    @staticmethod
+    def _describe(entry):
+        if entry["op"] == "move":
+            return "to " + entry["list"]
+        if entry["op"] == "position":
+            return "to %s" % entry["pos"]
+        if entry["op"] == "comment":
+            return entry["text"]
+        if entry["op"] in ["create", "insert"]:
+            return "%s at %s" % (entry["data"].get("name", ""), entry["pos"])
+        return ""
+    #end function
+
+#end class
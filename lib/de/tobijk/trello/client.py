@@ -23,8 +23,28 @@
 # THE SOFTWARE.
 #
 
-import requests
-from .error import TrelloClientError, TrelloServerError, TrelloConnectionError
+import time
+import weakref
+import threading
+import contextlib
+import contextvars
+import urllib.parse
+
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .stream import iter_json_array
+from .instrument import endpoint
+from .error import TrelloBaseError, TrelloClientError, TrelloServerError, \
+        TrelloConnectionError
+
+# the client activated in the current thread or asyncio task, if any
+_active = contextvars.ContextVar("trello_client", default=None)
+
+# a (client, cache) pair set with Client.caching() for the current context
+_caching = contextvars.ContextVar("trello_cache", default=(None, None))
+
+# (client, listener) pairs added with Client.listening() for the context
+_listening = contextvars.ContextVar("trello_listeners", default=())
 
 def tci():
     return Client.instance()
@@ -33,27 +53,247 @@ class Client:
 
     INSTANCE = None
 
-    def __init__(self, key, token, url="https://api.trello.com/1/"):
+    # maximum number of routes Trello accepts in a single /batch call
+    BATCH_SIZE = 10
+
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, key, token, url="https://api.trello.com/1/",
+            pool_size=10, keep_alive=True, timeout=(5.0, 30.0), proxy=None,
+            rate_limiter=None, retry_policy=None, deadline=None,
+            default=True):
         self._url       = url
         self._key       = key
         self._token     = token
-        Client.INSTANCE = self
+        self._timeout   = tuple(timeout) if isinstance(timeout, (tuple, list))\
+                else (timeout, timeout)
+        self._deadline  = deadline
+        self._pool      = (pool_size, keep_alive, proxy)
+        self._session   = None
+        self._finalizer = None
+        self._lock      = threading.Lock()
+        self._local     = threading.local()
+        self._cache     = None
+        self._journal   = None
+        self._listeners = []
+        self._limiter   = RateLimiter() if rate_limiter is None \
+                else rate_limiter
+        self._retry     = RetryPolicy() if retry_policy is None \
+                else retry_policy
+
+        # Clients that are only ever used through activate() leave the
+        # process-wide default alone.
+        if default:
+            Client.INSTANCE = self
+    #end function
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # also runs when the client is collected or the interpreter exits
+        if self._finalizer is not None:
+            self._finalizer()
     #end function
 
     @classmethod
     def instance(cls):
-        return Client.INSTANCE
+        return _active.get() or Client.INSTANCE
 
-    def _execute(self, path, verb=None, params=None, data=None):
-        if params is None:
-            params = {}
+    @contextlib.contextmanager
+    def activate(self):
+        # Inside the block, models use this client instead of the default
+        # one. The setting is local to the current thread or asyncio task,
+        # so several accounts can be served concurrently.
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+    #end function
 
-        params.update({
-            "key":   self._key,
-            "token": self._token
-        })
+    def use_cache(self, cache):
+        self._cache = cache
 
-        full_url = self._url + path
+    @contextlib.contextmanager
+    def caching(self, cache):
+        # Inside the block, requests made in the current thread or asyncio
+        # task go through this cache instead of the one set with use_cache().
+        # Concurrent commands sharing the client can use different caches.
+        token = _caching.set((self, cache))
+        try:
+            yield cache
+        finally:
+            _caching.reset(token)
+    #end function
+
+    def _response_cache(self):
+        client, cache = _caching.get()
+        return cache if client is self else self._cache
+    #end function
+
+    def use_journal(self, journal):
+        self._journal = journal
+
+    def add_listener(self, listener):
+        # The listener is called with a dict describing each request after
+        # it completes, including requests answered from the cache.
+        self._listeners.append(listener)
+    #end function
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @contextlib.contextmanager
+    def listening(self, listener):
+        # Like add_listener(), but only for the requests made in the current
+        # thread or asyncio task and in the workers started from it, so that
+        # concurrent commands sharing the client are measured apart.
+        token = _listening.set(_listening.get() + ((self, listener),))
+        try:
+            yield listener
+        finally:
+            _listening.reset(token)
+    #end function
+
+    def _active_listeners(self):
+        return self._listeners + [listener for client, listener in
+                _listening.get() if client is self]
+    #end function
+
+    def retry_stats(self):
+        return self._retry.stats() if self._retry else {}
+
+    def _invalidate(self, *fragments):
+        cache = self._response_cache()
+
+        if cache is not None:
+            cache.invalidate(*fragments)
+    #end function
+
+    def _journaled(self, entry, call):
+        # Runs the mutation in call. If the API is out of reach, the entry
+        # describing it goes to the journal instead. While older entries
+        # wait in the journal, they are sent first to keep the order. Entries
+        # the API rejects on the way are kept in the journal's rejected().
+        journal = self._journal
+
+        if journal is None or journal.replaying():
+            return call()
+
+        if journal.pending() and journal.replay(self)["pending"]:
+            journal.append(entry)
+            return None
+        #end if
+
+        try:
+            return call()
+        except (TrelloConnectionError, TrelloServerError):
+            journal.append(entry)
+        #end try
+
+        return None
+    #end function
+
+    @contextlib.contextmanager
+    def batch(self):
+        # GETs issued through _fetch inside the block are collected and sent
+        # as /batch calls of up to BATCH_SIZE routes each. Results are handed
+        # to their callbacks when the block is left, when a batch fills up or
+        # when flush() is called.
+        outermost = getattr(self._local, "pending", None) is None
+
+        if outermost:
+            self._local.pending = []
+        try:
+            yield self
+            if outermost:
+                self.flush()
+        finally:
+            if outermost:
+                self._local.pending = None
+        #end try
+    #end function
+
+    def flush(self):
+        pending = getattr(self._local, "pending", None)
+
+        while pending:
+            chunk = pending[:Client.BATCH_SIZE]
+            del pending[:Client.BATCH_SIZE]
+
+            if len(chunk) == 1:
+                path, params, callback = chunk[0]
+                callback(self._execute(path, params=params))
+                continue
+            #end if
+
+            urls = ",".join([self._batch_route(path, params)
+                for path, params, callback in chunk])
+            results = self._execute("/batch", params={"urls": urls})
+
+            errors = []
+            cache  = self._response_cache()
+
+            for (path, params, callback), result in zip(chunk, results):
+                if "200" in result:
+                    if cache is not None:
+                        cache.store(path, self._auth(params),
+                                result["200"])
+                    callback(result["200"])
+                else:
+                    errors.append("%s: %s" %
+                            (path, result.get("message", result)))
+            #end for
+
+            if errors:
+                raise TrelloClientError("; ".join(errors))
+        #end while
+    #end function
+
+    def _fetch(self, path, callback, params=None):
+        pending = getattr(self._local, "pending", None)
+
+        if pending is None:
+            callback(self._execute(path, params=params))
+            return
+        #end if
+
+        cache = self._response_cache()
+
+        if cache is not None:
+            cached, fresh = cache.lookup(path, self._auth(params))
+            if cached is not None:
+                if not fresh:
+                    self._revalidate(cache, path, self._auth(params))
+                callback(cached)
+                return
+            #end if
+        #end if
+
+        pending.append((path, params, callback))
+
+        if len(pending) >= Client.BATCH_SIZE:
+            self.flush()
+    #end function
+
+    @staticmethod
+    def _batch_route(path, params):
+        route = "/" + path.lstrip("/")
+        if params:
+            route += "?" + urllib.parse.urlencode(params)
+        return route
+    #end function
+
+    def _auth(self, params):
+        return dict(params or {}, key=self._key, token=self._token)
+
+    def _execute(self, path, verb=None, params=None, data=None,
+            deadline=None, retry=None):
+        params = self._auth(params)
 
         if verb is None:
             if data is None:
@@ -62,11 +302,179 @@ class Client:
                 verb = "POST"
         #end if
 
+        cache = self._response_cache() if verb == "GET" and \
+                path != "/batch" else None
+
+        if cache is not None:
+            cached, fresh = cache.lookup(path, params)
+            if cached is not None:
+                if not fresh:
+                    self._revalidate(cache, path, params)
+                if self._active_listeners():
+                    self._notify(self._span(verb, path, cached=True))
+                return cached
+            #end if
+        #end if
+
+        result = self._request(verb, path, params, data, deadline=deadline,
+                retry=retry)
+
+        if cache is not None:
+            cache.store(path, params, result)
+
+        return result
+    #end function
+
+    def _stream(self, path, params=None, deadline=None):
+        # Yields the items of a JSON array response one by one, as they are
+        # decoded from the socket, without holding the whole body in memory.
+        # Streamed responses bypass the cache.
+        response = self._request("GET", path, self._auth(params), None,
+                deadline=deadline, stream=True)
+
+        with contextlib.closing(response):
+            for item in iter_json_array(response.iter_content(
+                    chunk_size=Client.STREAM_CHUNK_SIZE)):
+                yield item
+        #end with
+    #end function
+
+    def _revalidate(self, cache, path, params):
+        def revalidate():
+            try:
+                cache.store(path, params,
+                        self._request("GET", path, params, None))
+            except TrelloBaseError:
+                pass
+        #end function
+
+        threading.Thread(target=revalidate).start()
+    #end function
+
+    def _request(self, verb, path, params, data, deadline=None, retry=None,
+            stream=False):
+        policy  = self._retry
+        attempt = 0
+        span    = self._span(verb, path) if self._active_listeners() \
+                else None
+        started = time.monotonic()
+
+        if deadline is None:
+            deadline = self._deadline
+        if deadline is not None:
+            deadline = time.monotonic() + deadline
+        if retry is None:
+            retry = bool(policy) and policy.is_retryable(verb)
+
         try:
-            response = requests.request(verb, self._url + path, params=params,
-                data=data)
-        except requests.exceptions.ConnectionError:
-            raise TrelloConnectionError("could not connect to server.")
+            while True:
+                timeout = self._timeout
+
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TrelloConnectionError("deadline exceeded.")
+                    timeout = tuple(min(t, remaining) for t in timeout)
+                #end if
+
+                try:
+                    result = self._send(verb, path, params, data, timeout,
+                            stream=stream, span=span)
+                    break
+                except (TrelloServerError, TrelloConnectionError):
+                    delay = policy.delay(attempt) if retry else 0.0
+
+                    if not retry or (deadline is not None and
+                            time.monotonic() + delay >= deadline) or \
+                            not policy.may_retry(attempt):
+                        if policy:
+                            policy.record(attempt + 1)
+                        raise
+                    #end if
+
+                    attempt += 1
+                    time.sleep(delay)
+                #end try
+            #end while
+        except TrelloBaseError as e:
+            if span is not None:
+                span["error"] = str(e)
+            raise
+        finally:
+            if span is not None:
+                span["latency"] = time.monotonic() - started
+                span["retries"] = attempt
+                self._notify(span)
+            #end if
+        #end try
+
+        if policy:
+            policy.record(attempt + 1)
+
+        return result
+    #end function
+
+    @staticmethod
+    def _span(verb, path, cached=False):
+        return {
+            "start":     time.time(),
+            "verb":      verb,
+            "path":      path,
+            "endpoint":  endpoint(verb, path),
+            "status":    None,
+            "latency":   0.0,
+            "size":      None,
+            "retries":   0,
+            "throttled": 0,
+            "cached":    cached,
+            "error":     None
+        }
+    #end function
+
+    def _notify(self, span):
+        for listener in self._active_listeners():
+            listener(span)
+    #end function
+
+    def _send(self, verb, path, params, data, timeout, stream=False,
+            span=None):
+        import requests
+
+        full_url = self._url + path
+        attempt  = 0
+
+        while True:
+            if self._limiter:
+                self._limiter.acquire()
+
+            try:
+                response = self._get_session().request(verb, full_url,
+                    params=params, data=data, timeout=timeout, stream=stream)
+            except requests.exceptions.ConnectionError:
+                raise TrelloConnectionError("could not connect to server.")
+            except requests.exceptions.Timeout:
+                raise TrelloConnectionError("request timed out.")
+
+            if not self._limiter:
+                break
+
+            self._limiter.observe(response.headers)
+
+            if response.status_code != 429 or \
+                    attempt >= RateLimiter.MAX_RETRIES:
+                break
+
+            attempt += 1
+            self._limiter.pause(self._retry_after(response))
+        #end while
+
+        if span is not None:
+            span["status"]    = response.status_code
+            span["throttled"] = attempt
+            # a streamed body has not been read yet
+            span["size"]      = int(response.headers.get("Content-Length",
+                0)) if stream else len(response.content)
+        #end if
 
         if not response.ok:
             if response.status_code >= 500:
@@ -75,8 +483,59 @@ class Client:
                 raise TrelloClientError(response.reason + ": " + response.text)
         #end if
 
+        # a streamed response is handed out unread
+        if stream:
+            return response
+
         return response.json()
     #end function
 
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            pass
+        try:
+            return float(
+                response.headers["x-rate-limit-api-token-interval-ms"]) / 1000.0
+        except (KeyError, ValueError):
+            pass
+        return 1.0
+    #end function
+
+    def _get_session(self):
+        # The session is set up on the first request, which keeps the import
+        # of requests off the path of commands that never reach the network.
+        with self._lock:
+            if self._session is None:
+                self._session   = self._create_session(*self._pool)
+                self._finalizer = weakref.finalize(self, self._session.close)
+            #end if
+        #end with
+
+        return self._session
+    #end function
+
+    @staticmethod
+    def _create_session(pool_size, keep_alive, proxy):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                pool_maxsize=pool_size)
+
+        session.mount("https://", adapter)
+        session.mount("http://",  adapter)
+
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        if proxy:
+            session.proxies = {"http": proxy, "https": proxy}
+
+        return session
+    #end function
+
 #end class
 
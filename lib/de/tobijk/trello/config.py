@@ -35,10 +35,128 @@ class Config:
         "token": "INSERT APP TOKEN"
     }
 
+    CLIENT_OPTIONS = [
+        "url",
+        "pool_size",
+        "keep_alive",
+        "timeout",
+        "proxy",
+        "deadline"
+    ]
+
+    RETRY_OPTIONS = [
+        "max_retries",
+        "base_delay",
+        "max_delay",
+        "retry_post"
+    ]
+
+    @classmethod
+    def profile(cls, config, name=None):
+        # Returns the settings of the named profile from "profiles" on top of
+        # the top-level settings, which form the default profile.
+        if not name:
+            return config
+
+        try:
+            profile = config.get("profiles", {})[name]
+        except (KeyError, TypeError):
+            raise TrelloConfigUnusable("no profile '%s' in configuration." %
+                    name)
+        #end try
+
+        settings = dict(config)
+        settings.pop("profiles", None)
+        settings.update(profile)
+        settings["profile"] = name
+
+        return settings
+    #end function
+
+    @classmethod
+    def client_options(cls, config):
+        options = {}
+
+        for name in Config.CLIENT_OPTIONS:
+            if name in config:
+                options[name] = config[name]
+        #end for
+
+        return options
+    #end function
+
+    @classmethod
+    def cache_options(cls, config):
+        cache   = config.get("cache", {})
+        options = {}
+
+        if "ttl" in cache:
+            options["ttls"] = cache["ttl"]
+        if "max_size" in cache:
+            options["max_size"] = cache["max_size"]
+        if "stale_while_revalidate" in cache:
+            options["stale_while_revalidate"] = cache["stale_while_revalidate"]
+
+        return options
+    #end function
+
+    @classmethod
+    def rate_limit_options(cls, config):
+        rate_limit = config.get("rate_limit", {})
+        options    = {}
+
+        # "rate_limit": true asks for the defaults
+        if not isinstance(rate_limit, dict):
+            return options
+
+        for name in ["rate", "burst"]:
+            if name in rate_limit:
+                options[name] = rate_limit[name]
+
+        return options
+    #end function
+
+    @classmethod
+    def retry_options(cls, config):
+        retry   = config.get("retry", {})
+        options = {}
+
+        for name in Config.RETRY_OPTIONS:
+            if name in retry:
+                options[name] = retry[name]
+
+        return options
+    #end function
+
     @classmethod
     def get_config_folder(cls):
         return os.path.join(os.path.expanduser("~"), ".trello-cli")
 
+    @classmethod
+    def get_cache_folder(cls):
+        return os.path.join(Config.get_config_folder(), "cache")
+
+    @classmethod
+    def get_daemon_socket(cls):
+        return os.path.join(Config.get_config_folder(), "daemon.sock")
+
+    @classmethod
+    def get_journal_file(cls, profile=None):
+        filename = "journal-%s.jsonl" % profile if profile else \
+                "journal.jsonl"
+        return os.path.join(Config.get_config_folder(), filename)
+
+    @classmethod
+    def get_mirror_file(cls):
+        return os.path.join(Config.get_config_folder(), "mirror.sqlite")
+
+    @classmethod
+    def get_rate_limit_file(cls, profile=None):
+        # each token has a request budget of its own
+        filename = "ratelimit-%s.lock" % profile if profile else \
+                "ratelimit.lock"
+        return os.path.join(Config.get_config_folder(), filename)
+
     @classmethod
     def load_config(cls):
         config_dir  = Config.get_config_folder()
@@ -0,0 +1,250 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import io
+import os
+import sys
+import json
+import contextlib
+
+from .error  import TrelloConnectionError
+
+def forward(socket_file, argv):
+    # Runs the command on a daemon listening on socket_file and returns its
+    # exit status, or None if there is no daemon and the command should run
+    # in-process. Commands that read from stdin always run in-process.
+    if not os.path.exists(socket_file):
+        return None
+    if any(arg == "-" or arg.endswith("=-") for arg in argv):
+        return None
+
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        try:
+            sock.connect(socket_file)
+        except OSError:
+            return None
+
+        return _request(sock, {"argv": argv, "cwd": os.getcwd()})
+    finally:
+        sock.close()
+    #end try
+#end function
+
+def _frame(message):
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+def _request(sock, message):
+    # The daemon streams the command's output back as it is written, one
+    # frame per line, and ends with a frame holding the exit status.
+    try:
+        sock.sendall(_frame(message))
+        fp = sock.makefile("rb")
+    except OSError:
+        raise TrelloConnectionError("lost connection to the trello-cli daemon.")
+
+    with fp:
+        while True:
+            try:
+                frame = json.loads(fp.readline().decode("utf-8"))
+            except (OSError, ValueError):
+                raise TrelloConnectionError(
+                        "lost connection to the trello-cli daemon.")
+            #end try
+
+            if "status" in frame:
+                return frame["status"]
+
+            stream = sys.stdout if "stdout" in frame else sys.stderr
+            stream.write(frame.get("stdout", frame.get("stderr", "")))
+            stream.flush()
+        #end while
+    #end with
+#end function
+
+class _FrameWriter(io.TextIOBase):
+
+    # Sends everything written to it to the client as a frame {name: text}.
+    # If the client goes away, the command still runs to completion.
+
+    def __init__(self, conn, name):
+        self._conn = conn
+        self._name = name
+    #end function
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text and self._conn is not None:
+            try:
+                self._conn.sendall(_frame({self._name: text}))
+            except OSError:
+                self._conn = None
+        #end if
+        return len(text)
+    #end function
+
+#end class
+
+class Daemon:
+
+    def __init__(self, socket_file, config):
+        self._socket_file = socket_file
+        self._config      = config
+        self._running     = False
+    #end function
+
+    @staticmethod
+    def stop(socket_file):
+        import socket
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            try:
+                sock.connect(socket_file)
+            except OSError:
+                return False
+            _request(sock, {"stop": True})
+        finally:
+            sock.close()
+        #end try
+
+        return True
+    #end function
+
+    def serve(self, detach=False):
+        server = self._bind()
+
+        if detach:
+            self._detach()
+
+        self._running = True
+
+        try:
+            while self._running:
+                conn, addr = server.accept()
+                try:
+                    self._handle(conn)
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    conn.close()
+                #end try
+            #end while
+        finally:
+            server.close()
+            try:
+                os.unlink(self._socket_file)
+            except OSError:
+                pass
+        #end try
+    #end function
+
+    def _bind(self):
+        import socket
+
+        if os.path.exists(self._socket_file):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self._socket_file)
+            except OSError:
+                # left behind by a daemon that did not shut down cleanly
+                os.unlink(self._socket_file)
+            else:
+                raise TrelloConnectionError(
+                        "a daemon is already listening on '%s'." %
+                            self._socket_file)
+            finally:
+                probe.close()
+            #end try
+        #end if
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        # the socket runs commands with the user's credentials
+        umask = os.umask(0o177)
+        try:
+            server.bind(self._socket_file)
+        finally:
+            os.umask(umask)
+        #end try
+
+        server.listen(16)
+        return server
+    #end function
+
+    @staticmethod
+    def _detach():
+        if os.fork() != 0:
+            os._exit(0)
+        os.setsid()
+        if os.fork() != 0:
+            os._exit(0)
+
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in range(3):
+            os.dup2(devnull, fd)
+        os.close(devnull)
+    #end function
+
+    def _handle(self, conn):
+        with conn.makefile("rb") as fp:
+            message = json.loads(fp.readline().decode("utf-8"))
+
+        if message.get("stop"):
+            self._running = False
+            status = 0
+        else:
+            status = self._run(conn, message["argv"], message.get("cwd"))
+        #end if
+
+        conn.sendall(_frame({"status": status}))
+    #end function
+
+    def _run(self, conn, argv, cwd):
+        from .cli import Cli
+
+        stdout = _FrameWriter(conn, "stdout")
+        stderr = _FrameWriter(conn, "stderr")
+
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                return Cli.run(self._config, argv)
+            except OSError as e:
+                sys.stderr.write("trello-cli: %s\n" % str(e))
+                return Cli.EXIT_ERR
+            #end try
+        #end with
+    #end function
+
+#end class
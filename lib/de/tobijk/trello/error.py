@@ -35,6 +35,9 @@ class TrelloServerError(TrelloBaseError):
 class TrelloConnectionError(TrelloBaseError):
     pass
 
+class TrelloStrictModeError(TrelloBaseError):
+    pass
+
 class TrelloConfigUnusable(TrelloBaseError):
     pass
 
@@ -0,0 +1,243 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+from .bulk   import run_parallel
+
+def compression(filename):
+    # the compression implied by the file name
+    if filename.endswith(".gz"):
+        return "gzip"
+    if filename.endswith(".zst"):
+        return "zstd"
+    return None
+#end function
+
+def open_member(filename, fp):
+    # Returns a writer that compresses into fp as a complete gzip member or
+    # zstd frame once it is closed. Both formats allow such pieces to be
+    # concatenated, which is what makes appending on resume possible.
+    method = compression(filename)
+
+    if method == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=fp, mode="wb", mtime=0)
+    if method == "zstd":
+        # optional dependency
+        import zstandard
+        return zstandard.ZstdCompressor().stream_writer(fp, closefd=False)
+
+    return _Uncompressed(fp)
+#end function
+
+class _Uncompressed:
+
+    def __init__(self, fp):
+        self._fp = fp
+
+    def write(self, data):
+        return self._fp.write(data)
+
+    def close(self):
+        pass
+
+#end class
+
+class Exporter:
+
+    # record types in the order they appear for each board
+    TYPES = ["board", "label", "list", "card", "comment"]
+
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, filename, jobs=4, progress=None):
+        self._filename   = filename
+        self._checkpoint = filename + ".checkpoint"
+        self._manifest   = filename + ".manifest.json"
+        self._jobs       = jobs
+        self._progress   = progress
+        self._lock       = threading.Lock()
+        self._state      = None
+        self._out        = None
+
+        # fail before anything is written if zstandard is missing
+        if compression(filename) == "zstd":
+            import zstandard
+    #end function
+
+    def run(self, boards, resume=False):
+        # Exports the boards and returns the manifest along with a list of
+        # (board, error) tuples for the boards that failed. The manifest is
+        # only written once all boards are in the archive. Until then, the
+        # checkpoint records what is done, and run() with resume=True adds
+        # the missing boards.
+        state = self._load_checkpoint() if resume else None
+
+        if state is None or not os.path.exists(self._filename):
+            state = {"offset": 0, "boards": []}
+
+        self._state = state
+        self._out   = open(self._filename, "r+b" if state["offset"] else "wb")
+
+        try:
+            # drop whatever an interrupted run wrote after the last board
+            self._out.truncate(state["offset"])
+            self._out.seek(state["offset"])
+
+            done = set(entry["id"] for entry in state["boards"])
+            todo = [board for board in boards if board.id not in done]
+
+            results = run_parallel(self._export_board, todo, jobs=self._jobs,
+                    progress=self._progress)
+        finally:
+            self._out.close()
+        #end try
+
+        failed = [(board, error) for board, result, error in results
+                if error is not None]
+
+        if failed:
+            return None, failed
+
+        manifest = self._write_manifest()
+
+        try:
+            os.unlink(self._checkpoint)
+        except FileNotFoundError:
+            pass
+
+        return manifest, []
+    #end function
+
+    def _export_board(self, board):
+        # The board's records are streamed into a compressed piece in a
+        # temporary file, so a board never has to fit into memory, and the
+        # piece is appended to the archive in one go once it is complete.
+        counts = dict((type_, 0) for type_ in Exporter.TYPES)
+        digest = hashlib.sha256()
+
+        with tempfile.TemporaryFile(dir=os.path.dirname(
+                os.path.abspath(self._filename))) as tmp:
+            writer = open_member(self._filename, tmp)
+
+            try:
+                for type_, data in self._records(board):
+                    line = (json.dumps({"type": type_, "data": data},
+                        ensure_ascii=False) + "\n").encode("utf-8")
+                    writer.write(line)
+                    digest.update(line)
+                    counts[type_] += 1
+                #end for
+            finally:
+                writer.close()
+            #end try
+
+            with self._lock:
+                tmp.seek(0)
+                shutil.copyfileobj(tmp, self._out, Exporter.COPY_CHUNK_SIZE)
+                self._out.flush()
+                os.fsync(self._out.fileno())
+
+                self._state["offset"] = self._out.tell()
+                self._state["boards"].append({"id": board.id,
+                    "name": board.get("name", ""), "counts": counts,
+                        "sha256": digest.hexdigest()})
+                self._save_checkpoint()
+            #end with
+        #end with
+    #end function
+
+    def _records(self, board):
+        yield "board", dict(board)
+
+        for label in board.labels():
+            yield "label", dict(label)
+        for list_ in board.iter_lists(filter="all"):
+            yield "list", dict(list_)
+        for card in board.iter_cards(filter="all"):
+            yield "card", dict(card)
+        for action in board.iter_actions(filter="commentCard"):
+            yield "comment", action
+    #end function
+
+    def _load_checkpoint(self):
+        try:
+            with open(self._checkpoint, "r", encoding="utf-8") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+    #end function
+
+    def _save_checkpoint(self):
+        tmp_file = self._checkpoint + ".tmp"
+
+        with open(tmp_file, "w", encoding="utf-8") as fp:
+            json.dump(self._state, fp, ensure_ascii=False)
+            fp.flush()
+            os.fsync(fp.fileno())
+        #end with
+
+        os.replace(tmp_file, self._checkpoint)
+    #end function
+
+    def _write_manifest(self):
+        digest = hashlib.sha256()
+
+        with open(self._filename, "rb") as fp:
+            for chunk in iter(lambda: fp.read(Exporter.COPY_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        #end with
+
+        totals = dict((type_, 0) for type_ in Exporter.TYPES)
+
+        for entry in self._state["boards"]:
+            for type_, count in entry["counts"].items():
+                totals[type_] += count
+        #end for
+
+        manifest = {
+            "file":        os.path.basename(self._filename),
+            "compression": compression(self._filename),
+            "created":     time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "size":        self._state["offset"],
+            "sha256":      digest.hexdigest(),
+            "counts":      totals,
+            "boards":      self._state["boards"]
+        }
+
+        with open(self._manifest, "w", encoding="utf-8") as fp:
+            json.dump(manifest, fp, indent=4, ensure_ascii=False)
+
+        return manifest
+    #end function
+
+#end class
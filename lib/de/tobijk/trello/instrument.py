@@ -0,0 +1,139 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import re
+import json
+import math
+import threading
+
+# Trello object ids are 24 hex digits
+OBJECT_ID = re.compile(r"^[0-9a-fA-F]{24}$")
+
+def endpoint(verb, path):
+    # Groups requests by replacing object ids in the path, e.g.
+    # "GET /lists/5aee01947afe7dd2dc784df8/cards" -> "GET /lists/{id}/cards"
+    return verb + " /" + "/".join("{id}" if OBJECT_ID.match(part) else part
+            for part in path.strip("/").split("/"))
+#end function
+
+def percentile(values, p):
+    # nearest rank on sorted values
+    if not values:
+        return 0.0
+    return values[max(1, math.ceil(p / 100.0 * len(values))) - 1]
+#end function
+
+class Stats:
+
+    # A listener that aggregates spans by endpoint.
+
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self._endpoints = {}
+    #end function
+
+    def __call__(self, span):
+        with self._lock:
+            entry = self._endpoints.setdefault(span["endpoint"], {
+                "latencies": [], "cached": 0, "retries": 0, "errors": 0,
+                "size": 0})
+
+            if span["cached"]:
+                entry["cached"] += 1
+            else:
+                entry["latencies"].append(span["latency"])
+
+            entry["retries"] += span["retries"]
+            entry["errors"]  += 1 if span["error"] else 0
+            entry["size"]    += span["size"] or 0
+        #end with
+    #end function
+
+    def summary(self):
+        # Returns one dict per endpoint, the slowest endpoints first.
+        rows = []
+
+        with self._lock:
+            for name, entry in self._endpoints.items():
+                latencies = sorted(entry["latencies"])
+                rows.append({
+                    "endpoint": name,
+                    "count":    len(latencies) + entry["cached"],
+                    "cached":   entry["cached"],
+                    "retries":  entry["retries"],
+                    "errors":   entry["errors"],
+                    "size":     entry["size"],
+                    "total":    sum(latencies),
+                    "p50":      percentile(latencies, 50),
+                    "p95":      percentile(latencies, 95),
+                    "p99":      percentile(latencies, 99)
+                })
+            #end for
+        #end with
+
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+    #end function
+
+    def write(self, fp):
+        fp.write("| %-40.40s | %5s | %6s | %8s | %8s | %8s | %7s | %9s |\n" %
+                ("endpoint", "count", "cached", "p50 ms", "p95 ms",
+                    "p99 ms", "retries", "KB"))
+
+        for row in self.summary():
+            fp.write("| %-40.40s | %5d | %6d | %8.1f | %8.1f | %8.1f | "
+                "%7d | %9.1f |\n" % (row["endpoint"], row["count"],
+                    row["cached"], row["p50"] * 1000.0, row["p95"] * 1000.0,
+                    row["p99"] * 1000.0, row["retries"],
+                    row["size"] / 1024.0))
+        #end for
+    #end function
+
+#end class
+
+class Trace:
+
+    # A listener that appends each span as a JSON line to a file.
+
+    def __init__(self, filename):
+        self._lock = threading.Lock()
+        self._fp   = open(filename, "a", encoding="utf-8")
+    #end function
+
+    def __call__(self, span):
+        line = json.dumps(span, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            self._fp.write(line)
+            self._fp.flush()
+        #end with
+    #end function
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+    #end function
+
+#end class
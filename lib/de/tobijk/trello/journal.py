@@ -0,0 +1,300 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import threading
+import contextlib
+
+from .error import TrelloClientError, TrelloConnectionError, \
+        TrelloServerError
+
+def coalesce(entries):
+    # Drops the entries that later entries make redundant: earlier moves and
+    # repositionings of a card that is moved again, repeated archiving and
+    # all operations on a card that ends up deleted. The survivors keep
+    # their relative order.
+    result = []
+
+    for entry in entries:
+        op   = entry["op"]
+        card = entry.get("card")
+
+        if op == "delete":
+            result = [e for e in result if e.get("card") != card]
+        elif op in ["move", "archive", "position"]:
+            result = [e for e in result
+                    if e.get("card") != card or e["op"] != op]
+        #end if
+
+        result.append(entry)
+    #end for
+
+    return result
+#end function
+
+def created(obj_id):
+    # Trello ids start with the unix time of their creation in hex
+    return int(obj_id[:8], 16)
+
+class Journal:
+
+    # Mutations that could not reach the API are appended to a JSON lines
+    # file and sent later by replay(). Each entry has a unique key, and
+    # completed entries are marked with a {"done": key} line, so that an
+    # interrupted replay picks up where it stopped. Entries the API rejects
+    # are moved to a second file with the error message.
+
+    # how far the local clock may be ahead of Trello's
+    CLOCK_SKEW = 60
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._rejected = filename + ".rejected"
+        self._lock     = threading.Lock()
+        self._local    = threading.local()
+    #end function
+
+    def append(self, entry):
+        entry = dict(entry, key=uuid.uuid4().hex, time=time.time())
+
+        with self._locked():
+            self._write([entry], "a")
+
+        return entry
+    #end function
+
+    def pending(self):
+        # cheap enough to ask before every write
+        try:
+            return os.path.getsize(self._filename) > 0
+        except OSError:
+            return False
+    #end function
+
+    def replaying(self):
+        return getattr(self._local, "replaying", False)
+
+    def entries(self):
+        with self._locked():
+            return self._read()
+
+    def rejected(self):
+        with self._locked():
+            return self._read(self._rejected)
+
+    def clear(self):
+        with self._locked():
+            self._write([], "w")
+            self._write([], "w", self._rejected)
+        #end with
+    #end function
+
+    def replay(self, client):
+        # Sends the coalesced entries in order with the given client. Stops
+        # at the first entry that fails for lack of connectivity and keeps it
+        # and all following entries. Entries the API rejects are reported
+        # and kept for rejected().
+        report = {"sent": 0, "coalesced": 0, "failed": [], "pending": 0}
+
+        with self._locked():
+            entries = self._read()
+            plan    = coalesce(entries)
+
+            report["coalesced"] = len(entries) - len(plan)
+
+            # the redundant entries must be gone before anything is sent
+            if report["coalesced"]:
+                self._rewrite(plan)
+
+            # the cards and comments accounted for by an entry so far
+            self._local.claimed   = set()
+            self._local.replaying = True
+            try:
+                with client.activate():
+                    for i, entry in enumerate(plan):
+                        try:
+                            self._send(client, entry)
+                            report["sent"] += 1
+                        except (TrelloConnectionError, TrelloServerError):
+                            report["pending"] = len(plan) - i
+                            break
+                        except TrelloClientError as e:
+                            report["failed"].append((entry, e))
+                            self._write([dict(entry, error=str(e))], "a",
+                                    self._rejected)
+                        #end try
+
+                        self._write([{"done": entry["key"]}], "a")
+                    #end for
+                #end with
+            finally:
+                self._local.replaying = False
+            #end try
+
+            if not report["pending"]:
+                self._write([], "w")
+        #end with
+
+        return report
+    #end function
+
+    def _send(self, client, entry):
+        from .card import Card
+        from .list import List
+
+        op   = entry["op"]
+        card = Card({"id": entry.get("card")})
+
+        if op == "move":
+            card.move_to(entry["list"])
+        elif op == "position":
+            card.set_position(entry["pos"])
+        elif op == "archive":
+            card.archive()
+        elif op == "delete":
+            try:
+                card.delete()
+            except TrelloClientError as e:
+                # deleted by an earlier, interrupted replay
+                if not str(e).startswith("Not Found"):
+                    raise
+            #end try
+        elif op == "comment":
+            found = self._find_comment(client, entry)
+
+            if found is None:
+                found = card.add_comment(entry["text"])["id"]
+
+            self._local.claimed.add(found)
+        elif op in ["create", "insert"]:
+            list_ = List({"id": entry["list"]})
+            card  = Card(entry["data"])
+            found = self._find_card(list_, card, entry)
+
+            if found is None:
+                if op == "insert":
+                    list_.insert(entry["pos"], card)
+                else:
+                    list_.create_card(card, entry["pos"])
+                found = card.get("id")
+            #end if
+
+            self._local.claimed.add(found)
+        else:
+            raise TrelloClientError("unknown journal operation '%s'." % op)
+        #end if
+    #end function
+
+    def _find_comment(self, client, entry):
+        # The request may have reached the server before the connection
+        # broke, so comments and cards are only added if they do not exist.
+        actions = client._execute("/cards/" + entry["card"] + "/actions",
+                params={"filter": "commentCard", "fields": "data"})
+
+        return self._unclaimed(entry, [(action["id"],
+            action.get("data", {}).get("text")) for action in actions],
+                entry["text"])
+    #end function
+
+    def _find_card(self, list_, card, entry):
+        return self._unclaimed(entry, [(c["id"], c.get("name")) for c in
+            list_.cards(fields=("id", "name"))], card.get("name"))
+
+    def _unclaimed(self, entry, candidates, value):
+        # Returns the id of the first (id, value) candidate that was created
+        # since the entry was recorded and that no earlier entry of this
+        # replay accounts for. Older objects with the same name or text are
+        # not the lost request, and each object stands for one entry only,
+        # so that repeated entries are all sent.
+        if not value:
+            return None
+
+        for obj_id, obj_value in candidates:
+            if obj_value == value and obj_id not in self._local.claimed and \
+                    created(obj_id) >= entry["time"] - Journal.CLOCK_SKEW:
+                return obj_id
+        #end for
+
+        return None
+    #end function
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # The journal file is replaced on rewrites, so other processes are
+        # kept out with a lock on a separate file.
+        with self._lock:
+            with open(self._filename + ".lock", "a") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                yield
+            #end with
+        #end with
+    #end function
+
+    def _read(self, filename=None):
+        entries = []
+        done    = set()
+
+        try:
+            with open(filename or self._filename, "r",
+                    encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        # a line cut short by a crash
+                        continue
+
+                    if "done" in item:
+                        done.add(item["done"])
+                    else:
+                        entries.append(item)
+                #end for
+            #end with
+        except FileNotFoundError:
+            pass
+
+        return [e for e in entries if e["key"] not in done]
+    #end function
+
+    def _write(self, items, mode, filename=None):
+        with open(filename or self._filename, mode, encoding="utf-8") as fp:
+            for item in items:
+                fp.write(json.dumps(item, ensure_ascii=False) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+        #end with
+    #end function
+
+    def _rewrite(self, entries):
+        tmp_file = self._filename + ".tmp"
+        self._write(entries, "w", tmp_file)
+        os.replace(tmp_file, self._filename)
+    #end function
+
+#end class
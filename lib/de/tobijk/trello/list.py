@@ -24,8 +24,10 @@
 #
 
 from .client import tci
-from .basemodel import BaseModel
+from .asyncclient import atci
+from .basemodel import BaseModel, DeferredList
 from .card import Card
+from .position import PositionAllocator
 
 class List(BaseModel):
 
@@ -34,10 +36,25 @@ class List(BaseModel):
     def __init__(self, data=None):
         super().__init__(data or {})
 
-    def cards(self):
-        params = {"fields": "id,name"}
-        cards_data = tci()._execute(self.PATH + "/" + self.id + Card.PATH,
+    def cards(self, fields=("id", "name")):
+        params = self._projection(fields)
+        cards  = DeferredList(tci())
+        tci()._fetch(self.PATH + "/" + self.id + Card.PATH,
+                lambda cards_data: cards.fill(map(Card, cards_data)),
                 params=params)
+        return cards
+    #end function
+
+    def iter_cards(self, fields=("id", "name")):
+        for card_data in tci()._stream(self.PATH + "/" + self.id + Card.PATH,
+                params=self._projection(fields)):
+            yield Card(card_data)
+    #end function
+
+    async def cards_async(self, fields=("id", "name")):
+        params = self._projection(fields)
+        cards_data = await atci()._execute(self.PATH + "/" + self.id +
+                Card.PATH, params=params)
         return [Card(data) for data in cards_data]
     #end function
 
@@ -45,31 +62,104 @@ class List(BaseModel):
         if not isinstance(pos, int):
             raise ValueError("first argument to insert must be an integer")
 
-        cards  = self.cards()
-        ncards = len(cards)
+        tci()._journaled({"op": "insert", "list": self.id, "pos": pos,
+            "data": dict(card)}, lambda: self._insert(pos, card))
+    #end function
+
+    def _insert(self, pos, card):
+        # the front of the list needs no listing
+        if pos == 0:
+            return self.create_card(card, "top")
+
+        cards = self.cards(fields=("id", "pos"))
+        tci().flush()
 
         if pos < 0:
-            pos = ncards + pos
-
-        if pos == 0 or ncards == 0:
-            pos = 0
-        elif pos >= ncards:
-            pos = cards[-1].pos + 1.0
-        elif ncards == 1:
-            pos = 0
+            pos = len(cards) + pos
+
+        if pos <= 0 or not cards:
+            pos = "top"
+        elif pos >= len(cards):
+            pos = "bottom"
         else:
-            card_a, card_b = cards[pos-1:pos+1]
-            pos = card_a.pos + (card_b.pos - card_a.pos) / 2.0
+            pos = self._make_room(cards, [pos])[0]
         #end if
 
+        self.create_card(card, pos)
+    #end function
+
+    def insert_many(self, items):
+        # Inserts (index, card) pairs with a single listing. The indices
+        # refer to the list as it is before any of the cards are added and,
+        # like for insert(), are clamped to the start and end of the list.
+        cards = self.cards(fields=("id", "pos"))
+        tci().flush()
+
+        indices   = [min(max(len(cards) + i if i < 0 else i, 0), len(cards))
+                for i, card in items]
+        positions = self._make_room(cards, indices)
+
+        for (index, card), pos in zip(items, positions):
+            self.create_card(card, pos)
+    #end function
+
+    def next_positions(self, count):
+        # positions for appending count cards to the list, in this order
+        cards = self.cards(fields=("id", "pos"))
+        tci().flush()
+        return PositionAllocator(cards).allocate([len(cards)] * count)[0]
+    #end function
+
+    def sort_plan(self, key, fields=("id", "name", "pos")):
+        # Returns (card, pos) pairs that sort the list by key when the cards
+        # are given these positions. Cards that compare equal keep their
+        # order, and as few cards as possible are moved.
+        cards = self.cards(fields=tuple(fields) + ("pos",))
+        tci().flush()
+
+        ranks = [0] * len(cards)
+        for rank, i in enumerate(sorted(range(len(cards)),
+                key=lambda i: key(cards[i]))):
+            ranks[i] = rank
+        #end for
+
+        by_id = dict((card.id, card) for card in cards)
+
+        return [(by_id[card_id], pos) for card_id, pos in
+                PositionAllocator(cards).reorder(ranks)]
+    #end function
+
+    def sort(self, key, fields=("id", "name", "pos")):
+        for card, pos in self.sort_plan(key, fields):
+            card.set_position(pos)
+    #end function
+
+    def _make_room(self, cards, indices):
+        # Returns positions for new cards at the given indices after moving
+        # the cards around gaps that have run out.
+        positions, moves = PositionAllocator(cards).allocate(indices)
+
+        for card_id, pos in moves:
+            Card({"id": card_id}).set_position(pos)
+
+        return positions
+    #end function
+
+    def create_card(self, card, pos="bottom"):
+        # pos is passed to Trello as is: a number, "top" or "bottom"
         params = {}
 
         params.update(card.as_query())
         params.update({"idList": self.id, "pos": pos})
 
-        result = tci()._execute(Card.PATH, verb="POST", params=params)
+        def create():
+            card.update(tci()._execute(Card.PATH, verb="POST",
+                params=params))
+        #end function
 
-        card.update(result)
+        tci()._journaled({"op": "create", "list": self.id, "pos": pos,
+            "data": dict(card)}, create)
+        tci()._invalidate(*Card.CACHED)
     #end function
 
 #end class
@@ -0,0 +1,579 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import re
+import json
+import time
+import sqlite3
+
+from .client import Client
+from .error  import TrelloClientError, TrelloConnectionError
+from .board  import Board
+from .list   import List
+from .card   import Card
+from .label  import Label
+
+class Mirror:
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS boards (
+            id          TEXT PRIMARY KEY,
+            name        TEXT,
+            last_action TEXT,
+            synced      REAL,
+            data        TEXT
+        );
+        CREATE TABLE IF NOT EXISTS lists (
+            id          TEXT PRIMARY KEY,
+            idBoard     TEXT,
+            pos         REAL,
+            data        TEXT
+        );
+        CREATE TABLE IF NOT EXISTS cards (
+            id          TEXT PRIMARY KEY,
+            idBoard     TEXT,
+            idList      TEXT,
+            pos         REAL,
+            data        TEXT
+        );
+        CREATE TABLE IF NOT EXISTS labels (
+            id          TEXT PRIMARY KEY,
+            idBoard     TEXT,
+            data        TEXT
+        );
+        CREATE TABLE IF NOT EXISTS comments (
+            id          TEXT PRIMARY KEY,
+            idCard      TEXT,
+            idBoard     TEXT,
+            date        TEXT,
+            text        TEXT
+        );
+        CREATE TABLE IF NOT EXISTS search_docs (
+            docid       INTEGER PRIMARY KEY,
+            idCard      TEXT UNIQUE
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5 (
+            name, desc, comments, tokenize = "unicode61"
+        );
+        CREATE INDEX IF NOT EXISTS lists_board ON lists (idBoard);
+        CREATE INDEX IF NOT EXISTS cards_board ON cards (idBoard);
+        CREATE INDEX IF NOT EXISTS cards_list  ON cards (idList);
+        CREATE INDEX IF NOT EXISTS labels_board ON labels (idBoard);
+        CREATE INDEX IF NOT EXISTS comments_card ON comments (idCard);
+    """
+
+    # relative weight of matches in card names, descriptions and comments
+    SEARCH_WEIGHTS = (10.0, 2.0, 1.0)
+
+    def __init__(self, filename):
+        self._db = sqlite3.connect(filename)
+
+        indexed = self._db.execute("SELECT 1 FROM sqlite_master "
+            "WHERE name = 'search'").fetchone()
+
+        self._db.executescript(Mirror.SCHEMA)
+
+        # mirrors from before the search index get theirs filled right away
+        if not indexed:
+            cards = self._db.execute("SELECT data FROM cards").fetchall()
+
+            with self._db:
+                for row in cards:
+                    self._index(json.loads(row[0]))
+            #end with
+        #end if
+    #end function
+
+    def close(self):
+        self._db.close()
+
+    def boards(self):
+        return [Board(json.loads(row[0])) for row in self._db.execute(
+            "SELECT data FROM boards ORDER BY name")]
+    #end function
+
+    def board(self, board_id):
+        row = self._db.execute("SELECT data FROM boards WHERE id = ?",
+                (board_id,)).fetchone()
+        return Board(json.loads(row[0])) if row else None
+    #end function
+
+    def lists(self, board_id):
+        return [List(json.loads(row[0])) for row in self._db.execute(
+            "SELECT data FROM lists WHERE idBoard = ? ORDER BY pos",
+                (board_id,))]
+    #end function
+
+    def list(self, list_id):
+        row = self._db.execute("SELECT data FROM lists WHERE id = ?",
+                (list_id,)).fetchone()
+        return List(json.loads(row[0])) if row else None
+    #end function
+
+    def cards(self, list_id):
+        return [Card(json.loads(row[0])) for row in self._db.execute(
+            "SELECT data FROM cards WHERE idList = ? ORDER BY pos",
+                (list_id,))]
+    #end function
+
+    def board_cards(self, board_id):
+        return [Card(json.loads(row[0])) for row in self._db.execute(
+            "SELECT data FROM cards WHERE idBoard = ? ORDER BY pos",
+                (board_id,))]
+    #end function
+
+    def iter_cards(self, list_id):
+        for row in self._db.execute("SELECT data FROM cards WHERE idList = ? "
+                "ORDER BY pos", (list_id,)):
+            yield Card(json.loads(row[0]))
+    #end function
+
+    def card(self, card_id):
+        row = self._db.execute("SELECT data FROM cards WHERE id = ?",
+                (card_id,)).fetchone()
+        return Card(json.loads(row[0])) if row else None
+    #end function
+
+    def labels(self, board_id):
+        return [Label(json.loads(row[0])) for row in self._db.execute(
+            "SELECT data FROM labels WHERE idBoard = ?", (board_id,))]
+    #end function
+
+    def snapshot(self, board_id):
+        # the offline counterpart of Board.snapshot()
+        board = self.board(board_id)
+        if board is None:
+            return None
+
+        labels = self.labels(board_id)
+        labels_by_id = dict((label["id"], label) for label in labels)
+
+        board["lists"]  = self.lists(board_id)
+        board["cards"]  = []
+        board["labels"] = labels
+
+        for list_ in board["lists"]:
+            list_["cards"] = self.cards(list_["id"])
+
+            for card in list_["cards"]:
+                card["labels"] = [labels_by_id[label_id] for label_id in
+                        card.get("idLabels", []) if label_id in labels_by_id]
+                board["cards"].append(card)
+            #end for
+        #end for
+
+        return board
+    #end function
+
+    def search(self, query, board_id=None, list_id=None, label=None,
+            limit=20):
+        # Every word of the query must match the start of a word in the
+        # name, description or comments of a card. Results are ranked by
+        # bm25, with hits in the name counting the most. The label may be
+        # given by id or name.
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+
+        sql  = "SELECT cards.data FROM search " \
+               "JOIN search_docs ON search_docs.docid = search.rowid " \
+               "JOIN cards ON cards.id = search_docs.idCard " \
+               "WHERE search MATCH ?"
+        args = [" ".join('"%s"*' % term for term in terms)]
+
+        if board_id:
+            sql += " AND cards.idBoard = ?"
+            args.append(board_id)
+        if list_id:
+            sql += " AND cards.idList = ?"
+            args.append(list_id)
+        if label:
+            sql += " AND EXISTS (SELECT 1 FROM json_each(cards.data, " \
+                   "'$.idLabels') WHERE json_each.value = ? OR " \
+                   "json_each.value IN (SELECT id FROM labels WHERE " \
+                   "json_extract(labels.data, '$.name') = ?))"
+            args.extend([label, label])
+        #end if
+
+        sql += " ORDER BY bm25(search, %s, %s, %s) LIMIT ?" % \
+                Mirror.SEARCH_WEIGHTS
+        args.append(limit)
+
+        return [Card(json.loads(row[0])) for row in
+                self._db.execute(sql, args)]
+    #end function
+
+    def sync(self, board_id, full=False):
+        # Returns the number of actions applied, or None after a full
+        # snapshot. The first sync of a board is always a full one.
+        row = self._db.execute("SELECT last_action FROM boards WHERE id = ?",
+                (board_id,)).fetchone()
+
+        if full or not row or not row[0]:
+            self._sync_full(board_id)
+            return None
+        #end if
+
+        return self._sync_actions(board_id, row[0])
+    #end function
+
+    def _sync_full(self, board_id):
+        board = Board({"id": board_id})
+
+        # Remember the newest action before taking the snapshot. Anything
+        # that happens in between is replayed by the next incremental sync.
+        last_action = None
+        for action in board.iter_actions(page_size=1):
+            last_action = action["id"]
+            break
+
+        board.snapshot()
+
+        comments = board.iter_actions(filter="commentCard")
+
+        with self._db:
+            for table in ["lists", "labels", "comments"]:
+                self._db.execute("DELETE FROM %s WHERE idBoard = ?" % table,
+                        (board_id,))
+            self._delete_cards("idBoard", board_id)
+
+            # comments go first, so that cards are indexed with them
+            for action in comments:
+                self._put_comment(board_id, action)
+            for list_ in board["lists"]:
+                self._put_list(list_)
+            for card in board["cards"]:
+                self._put_card(card)
+            for label in board["labels"]:
+                self._put_label(label)
+
+            data = dict((k, v) for k, v in board.items()
+                    if k not in ["lists", "cards", "labels"])
+            self._put_board(data, last_action)
+        #end with
+    #end function
+
+    def _sync_actions(self, board_id, last_action):
+        actions = list(Board({"id": board_id}).iter_actions(since=last_action))
+
+        with self._db:
+            # actions arrive newest first
+            for action in reversed(actions):
+                self._apply(board_id, action)
+
+            board = json.loads(self._db.execute(
+                "SELECT data FROM boards WHERE id = ?",
+                    (board_id,)).fetchone()[0])
+
+            self._put_board(board, actions[0]["id"] if actions else
+                    last_action)
+        #end with
+
+        return len(actions)
+    #end function
+
+    def _apply(self, board_id, action):
+        type_ = action.get("type", "")
+        data  = action.get("data", {})
+
+        if "card" in data and type_ in ["createCard", "updateCard",
+                "copyCard", "moveCardToBoard", "convertToCardFromCheckItem",
+                "addLabelToCard", "removeLabelFromCard"]:
+            card = self._get("cards", data["card"]["id"]) or {}
+            card.update(data["card"])
+            card["idBoard"] = board_id
+
+            list_ = data.get("listAfter") or data.get("list")
+            if list_:
+                card["idList"] = list_["id"]
+
+            if type_ in ["addLabelToCard", "removeLabelFromCard"]:
+                labels = [l for l in card.get("idLabels", [])
+                        if l != data["label"]["id"]]
+                if type_ == "addLabelToCard":
+                    labels.append(data["label"]["id"])
+                card["idLabels"] = labels
+            #end if
+
+            if card.get("closed"):
+                self._delete_cards("id", card["id"])
+            else:
+                self._put_card(card)
+        elif "card" in data and type_ in ["deleteCard", "moveCardFromBoard"]:
+            self._delete_cards("id", data["card"]["id"])
+        elif "card" in data and type_ == "commentCard":
+            self._put_comment(board_id, action)
+            self._reindex(data["card"]["id"])
+        elif "action" in data and type_ in ["updateComment",
+                "deleteComment"]:
+            row = self._db.execute("SELECT idCard FROM comments WHERE id = ?",
+                    (data["action"]["id"],)).fetchone()
+
+            if type_ == "updateComment":
+                self._db.execute("UPDATE comments SET text = ? WHERE id = ?",
+                        (data["action"].get("text", ""), data["action"]["id"]))
+            else:
+                self._delete("comments", data["action"]["id"])
+
+            if row:
+                self._reindex(row[0])
+        elif "list" in data and type_ in ["createList", "updateList",
+                "moveListToBoard"]:
+            list_ = self._get("lists", data["list"]["id"]) or {}
+            list_.update(data["list"])
+            list_["idBoard"] = board_id
+
+            if list_.get("closed"):
+                self._delete("lists", list_["id"])
+                self._delete_cards("idList", list_["id"])
+            else:
+                self._put_list(list_)
+        elif "list" in data and type_ == "moveListFromBoard":
+            self._delete("lists", data["list"]["id"])
+            self._delete_cards("idList", data["list"]["id"])
+        elif "label" in data and type_ in ["createLabel", "updateLabel"]:
+            label = self._get("labels", data["label"]["id"]) or {}
+            label.update(data["label"])
+            label["idBoard"] = board_id
+            self._put_label(label)
+        elif "label" in data and type_ == "deleteLabel":
+            self._delete("labels", data["label"]["id"])
+        elif "board" in data and type_ == "updateBoard":
+            board = self._get("boards", board_id) or {}
+            board.update(data["board"])
+            self._db.execute("UPDATE boards SET name = ?, data = ? "
+                "WHERE id = ?", (board.get("name"), json.dumps(board),
+                    board_id))
+        #end if
+    #end function
+
+    def _get(self, table, obj_id):
+        row = self._db.execute("SELECT data FROM %s WHERE id = ?" % table,
+                (obj_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    #end function
+
+    def _delete(self, table, obj_id):
+        self._db.execute("DELETE FROM %s WHERE id = ?" % table, (obj_id,))
+
+    def _delete_cards(self, column, value):
+        card_ids = [row[0] for row in self._db.execute(
+            "SELECT id FROM cards WHERE %s = ?" % column, (value,))]
+
+        for card_id in card_ids:
+            docid = self._db.execute("SELECT docid FROM search_docs "
+                "WHERE idCard = ?", (card_id,)).fetchone()
+            if docid:
+                self._db.execute("DELETE FROM search WHERE rowid = ?", docid)
+                self._db.execute("DELETE FROM search_docs WHERE docid = ?",
+                        docid)
+            #end if
+            self._db.execute("DELETE FROM comments WHERE idCard = ?",
+                    (card_id,))
+            self._delete("cards", card_id)
+        #end for
+    #end function
+
+    def _reindex(self, card_id):
+        card = self._get("cards", card_id)
+        if card:
+            self._index(card)
+    #end function
+
+    def _index(self, card):
+        self._db.execute("INSERT OR IGNORE INTO search_docs (idCard) "
+            "VALUES (?)", (card["id"],))
+        docid = self._db.execute("SELECT docid FROM search_docs "
+            "WHERE idCard = ?", (card["id"],)).fetchone()[0]
+
+        comments = " ".join([row[0] for row in self._db.execute(
+            "SELECT text FROM comments WHERE idCard = ? ORDER BY date",
+                (card["id"],))])
+
+        self._db.execute("DELETE FROM search WHERE rowid = ?", (docid,))
+        self._db.execute("INSERT INTO search (rowid, name, desc, comments) "
+            "VALUES (?, ?, ?, ?)", (docid, card.get("name") or "",
+                card.get("desc") or "", comments))
+    #end function
+
+    def _put_comment(self, board_id, action):
+        data = action.get("data", {})
+        self._db.execute("INSERT OR REPLACE INTO comments "
+            "(id, idCard, idBoard, date, text) VALUES (?, ?, ?, ?, ?)",
+                (action["id"], data.get("card", {}).get("id"), board_id,
+                    action.get("date"), data.get("text", "")))
+    #end function
+
+    def _put_board(self, board, last_action):
+        self._db.execute("INSERT OR REPLACE INTO boards "
+            "(id, name, last_action, synced, data) VALUES (?, ?, ?, ?, ?)",
+                (board["id"], board.get("name"), last_action, time.time(),
+                    json.dumps(board)))
+    #end function
+
+    def _put_list(self, list_):
+        list_ = dict((k, v) for k, v in list_.items() if k != "cards")
+        self._db.execute("INSERT OR REPLACE INTO lists "
+            "(id, idBoard, pos, data) VALUES (?, ?, ?, ?)",
+                (list_["id"], list_.get("idBoard"), list_.get("pos"),
+                    json.dumps(list_)))
+    #end function
+
+    def _put_card(self, card):
+        # label assignments are kept in idLabels, which actions update
+        card = dict((k, v) for k, v in card.items() if k != "labels")
+        self._db.execute("INSERT OR REPLACE INTO cards "
+            "(id, idBoard, idList, pos, data) VALUES (?, ?, ?, ?, ?)",
+                (card["id"], card.get("idBoard"), card.get("idList"),
+                    card.get("pos"), json.dumps(card)))
+        self._index(card)
+    #end function
+
+    def _put_label(self, label):
+        self._db.execute("INSERT OR REPLACE INTO labels "
+            "(id, idBoard, data) VALUES (?, ?, ?)",
+                (label["id"], label.get("idBoard"), json.dumps(label)))
+    #end function
+
+#end class
+
+class MirrorClient(Client):
+
+    # Answers the reads of the models from a Mirror instead of the API, so
+    # that code written against Board, List and Card runs offline inside
+    # activate(). Writes fail with a TrelloConnectionError, which sends them
+    # to the journal if the client has one. Only what sync() stores is
+    # there: open lists and cards, labels and the fields of the snapshot.
+
+    def __init__(self, mirror):
+        super().__init__(None, None, rate_limiter=False, retry_policy=False,
+                default=False)
+        self._mirror = mirror
+    #end function
+
+    def flush(self):
+        pass
+
+    def _fetch(self, path, callback, params=None):
+        callback(self._execute(path, params=params))
+
+    def _stream(self, path, params=None, deadline=None):
+        for item in self._execute(path, params=params):
+            yield item
+    #end function
+
+    def _execute(self, path, verb=None, params=None, data=None,
+            deadline=None, retry=None):
+        if verb not in [None, "GET"] or data is not None:
+            raise TrelloConnectionError("the local mirror is read-only.")
+
+        params = params or {}
+        parts  = [p for p in path.split("/") if p]
+        sub    = parts[2] if len(parts) > 2 else None
+
+        if parts == ["members", "me", "boards"]:
+            return [self._project(b, params) for b in self._mirror.boards()]
+        if len(parts) not in [2, 3]:
+            raise TrelloConnectionError("%s is not in the local mirror." %
+                    path)
+
+        resource, obj_id = parts[:2]
+
+        if resource == "boards" and sub is None:
+            return self._board(self._found(self._mirror.board(obj_id)),
+                    params)
+        if resource == "boards" and sub == "lists":
+            self._found(self._mirror.board(obj_id))
+            return [self._project(l, params) for l in
+                    self._mirror.lists(obj_id)]
+        if resource == "boards" and sub == "cards":
+            self._found(self._mirror.board(obj_id))
+            return self._cards(self._mirror.board_cards(obj_id), obj_id,
+                    params)
+        if resource == "boards" and sub == "labels":
+            self._found(self._mirror.board(obj_id))
+            return [self._project(l, params) for l in
+                    self._mirror.labels(obj_id)]
+        if resource == "lists" and sub is None:
+            return self._project(self._found(self._mirror.list(obj_id)),
+                    params)
+        if resource == "lists" and sub == "cards":
+            list_ = self._found(self._mirror.list(obj_id))
+            return self._cards(self._mirror.cards(obj_id),
+                    list_.get("idBoard"), params)
+        if resource == "cards" and sub is None:
+            card = self._found(self._mirror.card(obj_id))
+            return self._cards([card], card.get("idBoard"), params)[0]
+
+        raise TrelloConnectionError("%s is not in the local mirror." % path)
+    #end function
+
+    def _board(self, board, params):
+        # the nested lists, cards and labels of Board.snapshot()
+        data = self._project(board, params)
+
+        if params.get("lists"):
+            data["lists"] = self._mirror.lists(board["id"])
+        if params.get("cards"):
+            data["cards"] = self._cards(self._mirror.board_cards(
+                board["id"]), board["id"], {})
+        if params.get("labels"):
+            data["labels"] = self._mirror.labels(board["id"])
+
+        return data
+    #end function
+
+    def _cards(self, cards, board_id, params):
+        # the mirror keeps label ids, the API also returns the labels
+        labels = dict((label["id"], label) for label in
+                self._mirror.labels(board_id)) if board_id else {}
+
+        for card in cards:
+            card["labels"] = [labels[label_id] for label_id in
+                    card.get("idLabels", []) if label_id in labels]
+
+        return [self._project(card, params) for card in cards]
+    #end function
+
+    @staticmethod
+    def _found(obj):
+        if obj is None:
+            raise TrelloClientError("Not Found: the object is not in the "
+                    "local mirror.")
+        return obj
+    #end function
+
+    @staticmethod
+    def _project(obj, params):
+        fields = params.get("fields")
+
+        if not fields or fields == "all":
+            return dict(obj)
+
+        names = set(fields.split(",")) | {"id"}
+        return dict((k, v) for k, v in obj.items() if k in names)
+    #end function
+
+#end class
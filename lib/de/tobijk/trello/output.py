@@ -0,0 +1,146 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import json
+
+FORMATS = ["table", "json", "ndjson", "csv", "tsv"]
+
+# column widths in tables, fields not listed here get DEFAULT_WIDTH
+WIDTHS = {
+    "id":   24,
+    "name": 40
+}
+
+DEFAULT_WIDTH = 20
+
+def create_writer(format_, fp, fields, widths=None):
+    # Returns a writer that formats objects one at a time as they are passed
+    # to its write method. close must be called after the last object.
+    if format_ == "table":
+        return TableWriter(fp, fields, widths)
+    if format_ == "json":
+        return JsonWriter(fp, fields)
+    if format_ == "ndjson":
+        return NdjsonWriter(fp, fields)
+    if format_ == "csv":
+        return CsvWriter(fp, fields, ",")
+    if format_ == "tsv":
+        return CsvWriter(fp, fields, "\t")
+
+    raise ValueError("unknown output format '%s'" % format_)
+#end function
+
+def text(value):
+    # a field value as plain text for tables and CSV
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ",".join(text(item.get("name") or item.get("color") or
+            item.get("id")) if isinstance(item, dict) else text(item)
+                for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+#end function
+
+class TableWriter:
+
+    def __init__(self, fp, fields, widths=None):
+        self._fp     = fp
+        self._fields = fields
+        self._count  = 0
+        self._format = "| %3d | " + " | ".join("%%-%d.%ds" % (w, w)
+            for w in [(widths or {}).get(f, WIDTHS.get(f, DEFAULT_WIDTH))
+                for f in fields]) + " |\n"
+    #end function
+
+    def write(self, obj):
+        self._fp.write(self._format % ((self._count,) +
+            tuple(text(obj.get(f)) for f in self._fields)))
+        self._count += 1
+    #end function
+
+    def close(self):
+        pass
+
+#end class
+
+class JsonWriter:
+
+    def __init__(self, fp, fields):
+        self._fp     = fp
+        self._fields = fields
+        self._count  = 0
+    #end function
+
+    def write(self, obj):
+        self._fp.write("[\n" if self._count == 0 else ",\n")
+        self._fp.write(json.dumps(dict((f, obj.get(f)) for f in self._fields),
+            ensure_ascii=False))
+        self._count += 1
+    #end function
+
+    def close(self):
+        self._fp.write("[]\n" if self._count == 0 else "\n]\n")
+
+#end class
+
+class NdjsonWriter:
+
+    def __init__(self, fp, fields):
+        self._fp     = fp
+        self._fields = fields
+    #end function
+
+    def write(self, obj):
+        self._fp.write(json.dumps(dict((f, obj.get(f)) for f in self._fields),
+            ensure_ascii=False) + "\n")
+    #end function
+
+    def close(self):
+        pass
+
+#end class
+
+class CsvWriter:
+
+    def __init__(self, fp, fields, delimiter):
+        import csv
+
+        self._fields = fields
+        self._writer = csv.writer(fp, delimiter=delimiter,
+                lineterminator="\n")
+        self._writer.writerow(fields)
+    #end function
+
+    def write(self, obj):
+        self._writer.writerow([text(obj.get(f)) for f in self._fields])
+
+    def close(self):
+        pass
+
+#end class
@@ -0,0 +1,205 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import bisect
+
+def longest_increasing(values):
+    # Returns the indices of a longest strictly increasing subsequence of
+    # values in O(n log n).
+    tails = []
+    ends  = []
+    prev  = [None] * len(values)
+
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tails, value)
+
+        if k == len(tails):
+            tails.append(value)
+            ends.append(i)
+        else:
+            tails[k] = value
+            ends[k]  = i
+        #end if
+
+        prev[i] = ends[k - 1] if k > 0 else None
+    #end for
+
+    result = []
+    i      = ends[-1] if ends else None
+
+    while i is not None:
+        result.append(i)
+        i = prev[i]
+    #end while
+
+    return result[::-1]
+#end function
+
+class PositionAllocator:
+
+    # the distance Trello leaves between cards added at the bottom
+    STEP = 16384.0
+
+    # Below this distance between neighbours there is no room left for
+    # further midpoints, and the cards around it are spread out again.
+    MIN_GAP = 1.0 / 1024
+
+    # Spread out cards are at least this far apart, enough for 14 more
+    # halvings before the gap runs out again.
+    REBALANCE_GAP = 16.0
+
+    def __init__(self, cards):
+        # cards in list order, each with an "id" and a "pos"
+        self._cards = [(card["id"], float(card["pos"])) for card in cards]
+
+    def allocate(self, indices):
+        # Returns positions for new cards and the moves needed to make room
+        # for them. Each new card goes before the card at the given index of
+        # the current list, len(cards) meaning the end. New cards at the same
+        # index keep their order. Moves are (card_id, pos) tuples and only
+        # touch the cards around gaps that are too narrow, which keep their
+        # order among each other.
+        count = len(self._cards)
+        order = sorted(range(len(indices)), key=lambda i: indices[i])
+
+        # Merge the new cards into the list. Placed slots are (id, pos, i)
+        # tuples, with i the number of a new card or None, while new cards
+        # that still need a position are just their number.
+        slots = []
+        j     = 0
+
+        for i in order:
+            while j < min(max(indices[i], 0), count):
+                slots.append(self._cards[j] + (None,))
+                j += 1
+            #end while
+
+            slots.append(i)
+        #end for
+
+        slots.extend(card + (None,) for card in self._cards[j:])
+
+        def placed(n):
+            return isinstance(slots[n], tuple)
+
+        def next_placed(n):
+            n += 1
+            while n < len(slots) and not placed(n):
+                n += 1
+            return n
+        #end function
+
+        positions = [None] * len(indices)
+        moves     = {}
+        i         = 0
+
+        while i < len(slots):
+            if placed(i):
+                i += 1
+                continue
+            #end if
+
+            # the slots between lo and hi get spread out evenly
+            lo     = i - 1
+            hi     = next_placed(lo)
+            target = PositionAllocator.MIN_GAP
+
+            while True:
+                start = slots[lo][1] if lo >= 0 else 0.0
+
+                if hi == len(slots):
+                    spread = [start + PositionAllocator.STEP * (n + 1)
+                            for n in range(hi - lo - 1)]
+                    break
+                #end if
+
+                gap = (slots[hi][1] - start) / (hi - lo)
+
+                if gap >= target:
+                    spread = [start + gap * (n + 1)
+                            for n in range(hi - lo - 1)]
+                    break
+                #end if
+
+                # Widen the window by the neighbour with the larger gap
+                # beyond it. The last card has unlimited room after it.
+                after = next_placed(hi)
+
+                if lo < 0:
+                    left = -1.0
+                else:
+                    left = slots[lo][1] - (slots[lo - 1][1] if lo > 0 else 0.0)
+                if after == len(slots):
+                    right = float("inf")
+                else:
+                    right = slots[after][1] - slots[hi][1]
+
+                if left > right:
+                    lo -= 1
+                else:
+                    hi = after
+
+                target = PositionAllocator.REBALANCE_GAP
+            #end while
+
+            for n, pos in zip(range(lo + 1, hi), spread):
+                slot = slots[n]
+
+                if not isinstance(slot, tuple):
+                    slot = (None, pos, slot)
+                if slot[2] is None:
+                    moves[slot[0]] = pos
+                else:
+                    positions[slot[2]] = pos
+
+                slots[n] = (slot[0], pos, slot[2])
+            #end for
+
+            i = hi
+        #end while
+
+        return positions, list(moves.items())
+    #end function
+
+    def reorder(self, ranks):
+        # Returns the moves that put the cards into the order of their
+        # ranks, which must be distinct. The cards along a longest
+        # increasing run of ranks stay put and only the others are moved.
+        keep    = longest_increasing(ranks)
+        kept    = [self._cards[i] for i in keep]
+        anchors = [ranks[i] for i in keep]
+        movers  = sorted((ranks[i], i) for i in set(range(len(ranks))) -
+                set(keep))
+
+        allocator = PositionAllocator({"id": card_id, "pos": pos}
+                for card_id, pos in kept)
+        positions, moves = allocator.allocate([bisect.bisect_left(anchors,
+            rank) for rank, i in movers])
+
+        return moves + [(self._cards[i][0], pos)
+                for (rank, i), pos in zip(movers, positions)]
+    #end function
+
+#end class
@@ -0,0 +1,151 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import json
+import time
+import fcntl
+import threading
+
+class RateLimiter:
+
+    # Trello allows 300 requests per 10 seconds per API key and 100 requests
+    # per 10 seconds per token. The token limit is the one a single user hits.
+    LIMIT  = 100
+    WINDOW = 10.0
+
+    # A full bucket plus what flows in during one window must stay within
+    # the limit, or a burst following a quiet spell is answered with 429s.
+    # Half of the limit goes to the burst, the other half to the refill.
+    DEFAULT_BURST = LIMIT // 2
+    DEFAULT_RATE  = (LIMIT - DEFAULT_BURST) / WINDOW
+
+    # how often a throttled (429) request is retried before giving up
+    MAX_RETRIES = 5
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+            state_file=None):
+        self._rate       = float(rate)
+        self._burst      = float(burst)
+        self._state_file = state_file
+        self._state      = self._initial_state()
+        self._lock       = threading.Lock()
+    #end function
+
+    def acquire(self):
+        while True:
+            wait = self._update(self._take)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        #end while
+    #end function
+
+    def pause(self, seconds):
+        # hold back all callers, in this and in other processes
+        def pause(state, now):
+            state["until"]  = max(state["until"], now + seconds)
+            state["tokens"] = 0.0
+            state["stamp"]  = state["until"]
+        #end function
+
+        self._update(pause)
+    #end function
+
+    def observe(self, headers):
+        remaining = []
+
+        for name in ["x-rate-limit-api-token-remaining",
+                "x-rate-limit-api-key-remaining"]:
+            try:
+                remaining.append(float(headers[name]))
+            except (KeyError, ValueError):
+                pass
+        #end for
+
+        if not remaining:
+            return
+
+        # the server's view wins if it is stricter than ours
+        def observe(state, now):
+            self._refill(state, now)
+            state["tokens"] = min(state["tokens"], min(remaining))
+        #end function
+
+        self._update(observe)
+    #end function
+
+    def _take(self, state, now):
+        if state["until"] > now:
+            return state["until"] - now
+
+        self._refill(state, now)
+
+        if state["tokens"] >= 1.0:
+            state["tokens"] -= 1.0
+            return 0.0
+        #end if
+
+        return (1.0 - state["tokens"]) / self._rate
+    #end function
+
+    def _refill(self, state, now):
+        if now > state["stamp"]:
+            state["tokens"] = min(self._burst,
+                    state["tokens"] + (now - state["stamp"]) * self._rate)
+            state["stamp"] = now
+        #end if
+    #end function
+
+    def _initial_state(self):
+        return {"tokens": self._burst, "stamp": time.time(), "until": 0.0}
+
+    def _update(self, func):
+        with self._lock:
+            if self._state_file is None:
+                return func(self._state, time.time())
+
+            # The bucket lives in a shared file, which is locked for the
+            # duration of the update, so that all processes draw from it.
+            with open(self._state_file, "a+", encoding="utf-8") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+
+                fp.seek(0)
+                try:
+                    state = json.load(fp)
+                except ValueError:
+                    state = self._initial_state()
+
+                result = func(state, time.time())
+
+                fp.seek(0)
+                fp.truncate()
+                json.dump(state, fp)
+            #end with
+
+            return result
+        #end with
+    #end function
+
+#end class
@@ -0,0 +1,97 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import random
+import threading
+
+class RetryPolicy:
+
+    IDEMPOTENT_VERBS = ["GET", "PUT", "DELETE"]
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=30.0,
+            retry_post=False, budget_ratio=0.1, min_budget=10):
+        self._max_retries  = max_retries
+        self._base_delay   = base_delay
+        self._max_delay    = max_delay
+        self._retry_post   = retry_post
+        self._budget_ratio = budget_ratio
+        self._min_budget   = min_budget
+        self._lock         = threading.Lock()
+        self._requests     = 0
+        self._retries      = 0
+        self._exhausted    = 0
+        self._histogram    = {}
+    #end function
+
+    def is_retryable(self, verb):
+        if verb in RetryPolicy.IDEMPOTENT_VERBS:
+            return True
+        return verb == "POST" and self._retry_post
+    #end function
+
+    def delay(self, attempt):
+        # exponential backoff with full jitter
+        return random.uniform(0.0,
+                min(self._max_delay, self._base_delay * 2 ** attempt))
+    #end function
+
+    def may_retry(self, attempt):
+        # Retries may only make up a fraction of all requests, so that an
+        # outage does not multiply the load on the server.
+        with self._lock:
+            if attempt >= self._max_retries:
+                self._exhausted += 1
+                return False
+
+            budget = self._min_budget + self._budget_ratio * self._requests
+
+            if self._retries >= budget:
+                self._exhausted += 1
+                return False
+
+            self._retries += 1
+            return True
+        #end with
+    #end function
+
+    def record(self, attempts):
+        with self._lock:
+            self._requests += 1
+            self._histogram[attempts] = self._histogram.get(attempts, 0) + 1
+        #end with
+    #end function
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests":  self._requests,
+                "retries":   self._retries,
+                "exhausted": self._exhausted,
+                "attempts":  dict(self._histogram)
+            }
+        #end with
+    #end function
+
+#end class
@@ -0,0 +1,149 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import shlex
+import threading
+
+from .error import CliInvocationError
+
+# commands that cannot be nested in a script
+NOT_SCRIPTABLE = ["exec", "daemon"]
+
+def parse_script(lines):
+    # Returns a list of (lineno, argv) tuples, one per command. Blank lines
+    # and comments are skipped, a leading 'trello-cli' is optional.
+    commands = []
+
+    for lineno, line in enumerate(lines, 1):
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise CliInvocationError("line %d: %s." % (lineno, str(e)))
+
+        if argv and argv[0] == "trello-cli":
+            argv = argv[1:]
+        if not argv:
+            continue
+
+        if argv[0] in NOT_SCRIPTABLE:
+            raise CliInvocationError("line %d: '%s' cannot be used in a "
+                    "script." % (lineno, argv[0]))
+        #end if
+
+        commands.append((lineno, argv))
+    #end for
+
+    return commands
+#end function
+
+def resources(argv):
+    # The ids a command refers to. Commands sharing any of them must run in
+    # script order, all others may run concurrently.
+    keys = set()
+
+    for i, arg in enumerate(argv):
+        if not arg.startswith("--"):
+            continue
+
+        name, sep, value = arg.partition("=")
+
+        # --from-list and --to-list take list ids as well
+        if not (name.endswith("-id") or name in ["--from-list",
+                "--to-list"]):
+            continue
+        if not sep:
+            value = argv[i+1] if i + 1 < len(argv) else ""
+        if value:
+            keys.add(value.strip())
+    #end for
+
+    # the mirror database has a single writer
+    if argv[0] == "sync" or (argv[0] == "search" and "--sync" in argv):
+        keys.add(":mirror:")
+
+    return keys
+#end function
+
+def chains(commands):
+    # Splits the commands into chains that do not share any resources. The
+    # commands in each chain keep their script order.
+    parent = list(range(len(commands)))
+    owner  = {}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    #end function
+
+    for i, (lineno, argv) in enumerate(commands):
+        for key in resources(argv):
+            if key in owner:
+                parent[find(i)] = find(owner[key])
+            else:
+                owner[key] = i
+        #end for
+    #end for
+
+    groups = {}
+
+    for i, command in enumerate(commands):
+        groups.setdefault(find(i), []).append(command)
+
+    return sorted(groups.values(), key=lambda chain: chain[0][0])
+#end function
+
+class ThreadOutput:
+
+    # Stands in for sys.stdout or sys.stderr. Writes from threads that are
+    # capturing go to their own buffer, all others to the original stream.
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local  = threading.local()
+    #end function
+
+    def capture(self, buf):
+        self._local.buf = buf
+
+    def release(self):
+        self._local.buf = None
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def _target(self):
+        buf = getattr(self._local, "buf", None)
+        return self._stream if buf is None else buf
+    #end function
+
+#end class
@@ -0,0 +1,164 @@
+# -*- encoding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Tobias Koch <tobias.koch@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import re
+import json
+import codecs
+
+from .error import TrelloServerError
+
+WHITESPACE = " \t\r\n"
+
+# the characters that matter when looking for the end of an element
+STRUCTURE = re.compile(r'["\[\]{}]')
+IN_STRING = re.compile(r'["\\]')
+
+def scan_element(text, pos, state):
+    # Advances over a string, object or array without decoding it and
+    # returns the index just past its end, or None if it continues beyond
+    # text. state carries the nesting depth and string state across calls,
+    # so that each character is looked at only once.
+    while True:
+        if state["escape"]:
+            if pos >= len(text):
+                return None
+            state["escape"] = False
+            pos += 1
+            continue
+        #end if
+
+        if state["string"]:
+            m = IN_STRING.search(text, pos)
+            if m is None:
+                return None
+            pos = m.end()
+
+            if m.group() == "\\":
+                state["escape"] = True
+                continue
+            #end if
+
+            state["string"] = False
+        else:
+            m = STRUCTURE.search(text, pos)
+            if m is None:
+                return None
+            pos = m.end()
+
+            if m.group() == '"':
+                state["string"] = True
+                continue
+            #end if
+
+            state["depth"] += 1 if m.group() in "[{" else -1
+        #end if
+
+        if state["depth"] == 0:
+            return pos
+    #end while
+#end function
+
+def iter_json_array(chunks):
+    # Decode a JSON array from an iterable of byte chunks and yield its
+    # elements one at a time. Only the undecoded remainder of the input is
+    # kept in memory. An element that spans chunks is collected piece by
+    # piece and decoded once it is complete, instead of being decoded
+    # again from its start with every chunk.
+    decoder = json.JSONDecoder()
+    utf8    = codecs.getincrementaldecoder("utf-8")()
+    buf     = ""
+    started = False
+    pieces  = None
+    state   = None
+
+    for chunk in chunks:
+        text = utf8.decode(chunk)
+
+        if pieces is not None:
+            end = scan_element(text, 0, state)
+
+            if end is None:
+                pieces.append(text)
+                continue
+            #end if
+
+            pieces.append(text[:end])
+            buf    = "".join(pieces) + text[end:]
+            pieces = None
+        else:
+            buf += text
+        #end if
+
+        pos = 0
+
+        while True:
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                break
+
+            if not started:
+                if buf[pos] != "[":
+                    raise TrelloServerError("expected a JSON array.")
+                started = True
+                pos += 1
+                continue
+            #end if
+
+            if buf[pos] == ",":
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if buf[pos] in "[{\"":
+                    # the element continues in the next chunk
+                    state = {"depth": 0, "string": False, "escape": False}
+                    if scan_element(buf, pos, state) is not None:
+                        raise TrelloServerError("invalid JSON in response.")
+                    pieces = [buf[pos:]]
+                    pos    = len(buf)
+                #end if
+                break
+            #end try
+
+            # a number is only complete once a delimiter follows, "-2." may
+            # still turn into "-2.5"
+            if not isinstance(item, (dict, list, str)) and (end == len(buf)
+                    or buf[end] not in WHITESPACE + ",]"):
+                break
+
+            yield item
+            pos = end
+        #end while
+
+        buf = buf[pos:]
+    #end for
+
+    raise TrelloServerError("truncated JSON array in response.")
+#end function
@@ -19,6 +19,10 @@ setup(
     package_dir={'': 'lib'},
     platforms=['Linux'],
 
+    extras_require={
+        'zstd': ['zstandard']
+    },
+
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',